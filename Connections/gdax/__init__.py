@@ -2,3 +2,17 @@ from Connections.gdax.authenticated_client import AuthenticatedClient
 from Connections.gdax.public_client import PublicClient
 from Connections.gdax.websocket_client import WebsocketClient
 from Connections.gdax.order_book import OrderBook
+from Connections.gdax.price_level_book import PriceLevelBook
+from Connections.gdax.multi_order_book import MultiOrderBook
+from Connections.gdax.decoder import Decoder
+from Connections.gdax.frame_queue import FrameQueue
+from Connections.gdax.async_websocket_client import AsyncWebsocketClient
+from Connections.gdax.mongo_writer import MongoWriter
+from Connections.gdax.message_store import MessageStore
+from Connections.gdax.order_tracker import OrderTracker
+from Connections.gdax.candles import CandleAggregator
+from Connections.gdax.historic_rates import HistoricRates
+from Connections.gdax.async_authenticated_client import AsyncAuthenticatedClient
+from Connections.gdax.scheduler import RequestScheduler
+from Connections.gdax.checkpoint import PaginationCheckpoint
+from Connections.gdax.level2_book import Level2Book
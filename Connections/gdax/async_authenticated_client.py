@@ -0,0 +1,216 @@
+#
+# gdax/async_authenticated_client.py
+#
+# asyncio client for the public and authenticated GDAX REST endpoints,
+# with concurrent batch order placement and cancellation. Requires aiohttp.
+
+import asyncio
+import datetime
+import json
+import time
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from Connections.gdax.gdax_auth import auth_headers, get_signer
+from Connections.gdax.rate_limit import TokenBucket, PUBLIC_RATE, PUBLIC_BURST, PRIVATE_RATE, PRIVATE_BURST
+
+
+class AsyncAuthenticatedClient(object):
+    """ asyncio counterpart of `AuthenticatedClient`.
+
+    Requests are signed exactly like `GdaxAuth` does and every call first takes a
+    token from the public or private `TokenBucket`, sized to the exchange limits, so
+    the batch helpers can fan out freely without being answered with 429s.
+
+    Args:
+        key, b64secret, passphrase (str): API credentials.
+        url (Optional[str]): API URL. Defaults to GDAX API.
+        timeout (Optional[float]): Seconds per request.
+        session (Optional[aiohttp.ClientSession]): Session to use. One is created
+            (and closed by `close`) when not given.
+        public_bucket, private_bucket (Optional[TokenBucket]): Rate limiters, e.g. to
+            share them with other clients using the same API key.
+        retries (Optional[int]): Attempts per request when answered with HTTP 429.
+
+    """
+
+    def __init__(self, key, b64secret, passphrase, url="https://api.gdax.com", timeout=30, session=None,
+                 public_bucket=None, private_bucket=None, retries=3):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.b64secret = b64secret
+        self.passphrase = passphrase
+        self.signer = get_signer(b64secret)
+        self.timeout = timeout
+        self.session = session
+        self._owns_session = session is None
+        self.public_bucket = public_bucket if public_bucket else TokenBucket(PUBLIC_RATE, PUBLIC_BURST)
+        self.private_bucket = private_bucket if private_bucket else TokenBucket(PRIVATE_RATE, PRIVATE_BURST)
+        self.retries = retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self):
+        if aiohttp is None:
+            raise ImportError('AsyncAuthenticatedClient requires aiohttp')
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=PRIVATE_BURST),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def _request(self, method, path, params=None, body=None, private=True):
+        """ Send one request and return `(json, headers)`. """
+        session = self._session()
+        path_url = path
+        if params:
+            path_url += '?' + urlencode(params, doseq=True)
+        data = json.dumps(body) if body is not None else None
+        bucket = self.private_bucket if private else self.public_bucket
+        for attempt in range(self.retries):
+            await bucket.acquire_async()
+            headers = None
+            if private:
+                timestamp = str(time.time())
+                message = ''.join([timestamp, method, path_url, data or ''])
+                headers = auth_headers(self.signer, timestamp, message, self.key, self.passphrase)
+            async with session.request(method, self.url + path_url, data=data, headers=headers) as r:
+                if r.status == 429 and attempt + 1 < self.retries:
+                    print("{}: {} {}: Server HTTP response code 429".format(datetime.datetime.now(), method, path))
+                    await asyncio.sleep(1)
+                    continue
+                if r.status != 200:
+                    print("{}: {} {}: Server HTTP response code {}".format(datetime.datetime.now(), method, path,
+                                                                            r.status))
+                return await r.json(content_type=None), r.headers
+
+    async def _get(self, path, params=None, private=True):
+        return (await self._request('GET', path, params=params, private=private))[0]
+
+    async def _paginate(self, path, params=None):
+        """ Pages of a cursor paginated endpoint, in the list of pages shape of `AuthenticatedClient`. """
+        params = dict(params or {})
+        result = []
+        while True:
+            page, headers = await self._request('GET', path, params=params)
+            if page or not result:
+                result.append(page)
+            if 'cb-after' not in headers or not page:
+                return result
+            params['after'] = headers['cb-after']
+
+    # Public endpoints
+
+    async def get_products(self):
+        return await self._get('/products', private=False)
+
+    async def get_product_order_book(self, product_id, level=1):
+        return await self._get('/products/{}/book'.format(product_id), params={'level': level}, private=False)
+
+    async def get_product_ticker(self, product_id):
+        return await self._get('/products/{}/ticker'.format(product_id), private=False)
+
+    async def get_product_trades(self, product_id):
+        return await self._get('/products/{}/trades'.format(product_id), private=False)
+
+    async def get_product_historic_rates(self, product_id, start=None, end=None, granularity=None):
+        params = {}
+        if start is not None:
+            params['start'] = start
+        if end is not None:
+            params['end'] = end
+        if granularity is not None:
+            params['granularity'] = granularity
+        return await self._get('/products/{}/candles'.format(product_id), params=params, private=False)
+
+    async def get_product_24hr_stats(self, product_id):
+        return await self._get('/products/{}/stats'.format(product_id), private=False)
+
+    async def get_currencies(self):
+        return await self._get('/currencies', private=False)
+
+    async def get_time(self):
+        return await self._get('/time', private=False)
+
+    # Authenticated endpoints
+
+    async def get_account(self, account_id):
+        return await self._get('/accounts/' + account_id)
+
+    async def get_accounts(self):
+        return await self.get_account('')
+
+    async def get_account_history(self, account_id):
+        return await self._paginate('/accounts/{}/ledger'.format(account_id))
+
+    async def get_account_holds(self, account_id):
+        return await self._paginate('/accounts/{}/holds'.format(account_id))
+
+    async def place_order(self, product_id=None, side=None, **kwargs):
+        """ Place one order; `kwargs` is the order payload, as for `buy`/`sell`. """
+        if product_id is not None:
+            kwargs.setdefault('product_id', product_id)
+        if side is not None:
+            kwargs['side'] = side
+        return (await self._request('POST', '/orders', body=kwargs))[0]
+
+    async def buy(self, product_id, **kwargs):
+        return await self.place_order(product_id, 'buy', **kwargs)
+
+    async def sell(self, product_id, **kwargs):
+        return await self.place_order(product_id, 'sell', **kwargs)
+
+    async def cancel_order(self, order_id):
+        return (await self._request('DELETE', '/orders/' + order_id))[0]
+
+    async def cancel_all(self, product_id=''):
+        params = {'product_id': product_id} if product_id else None
+        return (await self._request('DELETE', '/orders/', params=params))[0]
+
+    async def get_order(self, order_id):
+        return await self._get('/orders/' + order_id)
+
+    async def get_orders(self, product_id='', status=[]):
+        params = {}
+        if product_id:
+            params['product_id'] = product_id
+        if status:
+            params['status'] = status
+        return await self._paginate('/orders', params)
+
+    async def get_fills(self, order_id='', product_id=''):
+        params = {}
+        if order_id:
+            params['order_id'] = order_id
+        if product_id:
+            params['product_id'] = product_id
+        return await self._paginate('/fills', params)
+
+    # Batches
+
+    async def place_orders_batch(self, orders):
+        """ Place every order payload in `orders` concurrently.
+
+        Returns:
+            list: The responses in the order of `orders`. A request that raised
+                is returned as its exception instead of aborting the batch.
+
+        """
+        return await asyncio.gather(*[self.place_order(**order) for order in orders], return_exceptions=True)
+
+    async def cancel_orders_batch(self, order_ids):
+        """ Cancel every order id in `order_ids` concurrently; results as for `place_orders_batch`. """
+        return await asyncio.gather(*[self.cancel_order(order_id) for order_id in order_ids], return_exceptions=True)
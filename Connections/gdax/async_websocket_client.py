@@ -0,0 +1,163 @@
+#
+# gdax/async_websocket_client.py
+#
+# asyncio template object to receive messages from the gdax Websocket Feed.
+# Requires aiohttp.
+
+from __future__ import print_function
+import asyncio
+import datetime
+import json
+import random
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from Connections.gdax.decoder import Decoder
+from Connections.gdax.websocket_client import subscribe_params
+
+
+class AsyncWebsocketClient(object):
+    """ asyncio counterpart of `WebsocketClient` with the same on_open/on_message/on_close/on_error hooks.
+
+    The connection is kept alive with native websocket ping/pong (`heartbeat` seconds) and
+    re-established with exponential backoff and full jitter. Any number of clients can run on
+    one event loop, optionally sharing one `aiohttp.ClientSession`; see `run_clients`.
+    """
+
+    def __init__(self, url="wss://ws-feed.gdax.com", products=None, channels=None, should_print=False, auth=False,
+                 key=None, b64secret=None, passphrase=None, decoder=None, session=None, heartbeat=30,
+                 min_backoff=1, max_backoff=60):
+        self.url = url.rstrip('/')
+        self.products = products if isinstance(products, list) else [products or "BTC-USD"]
+        self.channels = channels if channels is None or isinstance(channels, list) else [channels]
+        self.should_print = should_print
+        self.auth = auth
+        self.api_key = key
+        self.api_secret = b64secret
+        self.api_passphrase = passphrase
+        self.decoder = decoder if decoder else Decoder()
+        self.session = session
+        self.heartbeat = heartbeat
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stop = False
+        self.error = None
+        self.ws = None
+        self.reconnects = 0
+        self._attempt = 0
+
+    def start(self, loop=None):
+        """ Schedule the client on `loop` (default: the running loop) and return its task. """
+        loop = loop or asyncio.get_event_loop()
+        return loop.create_task(self.run())
+
+    async def run(self):
+        if aiohttp is None:
+            raise ImportError('AsyncWebsocketClient requires aiohttp')
+        session = self.session
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession()
+        try:
+            while not self.stop:
+                try:
+                    await self._connect(session)
+                    await self._listen()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.on_error(e)
+                finally:
+                    await self._disconnect()
+                if not self.stop:
+                    await self._backoff()
+        finally:
+            if own_session:
+                await session.close()
+
+    async def _connect(self, session):
+        if self.auth:
+            params = subscribe_params(self.products, self.channels, self.api_key, self.api_secret, self.api_passphrase)
+        else:
+            params = subscribe_params(self.products, self.channels)
+        self.ws = await session.ws_connect(self.url, heartbeat=self.heartbeat, autoping=True)
+        await self.ws.send_str(json.dumps(params))
+        self.on_open()
+
+    async def _listen(self):
+        async for frame in self.ws:
+            if frame.type == aiohttp.WSMsgType.TEXT:
+                # Only a connection that delivers data resets the backoff
+                self._attempt = 0
+                self.on_message(self.decoder.decode(frame.data))
+            elif frame.type == aiohttp.WSMsgType.ERROR:
+                self.on_error(self.ws.exception())
+                break
+            if self.stop:
+                break
+
+    async def _disconnect(self):
+        if self.ws is not None:
+            ws, self.ws = self.ws, None
+            await ws.close()
+            self.on_close()
+
+    async def _backoff(self):
+        delay = random.uniform(0, min(self.max_backoff, self.min_backoff * 2 ** self._attempt))
+        self._attempt += 1
+        self.reconnects += 1
+        print("{}: Reconnecting to channel(s) {} in {:.1f} seconds...".format(
+            datetime.datetime.now(), ', '.join(self.channels or []), delay))
+        await asyncio.sleep(delay)
+
+    async def close(self):
+        self.stop = True
+        await self._disconnect()
+
+    def on_open(self):
+        if self.should_print:
+            print("-- Subscribed! --\n")
+
+    def on_close(self):
+        if self.should_print:
+            print("\n-- Socket Closed --")
+
+    def on_message(self, msg):
+        if self.should_print:
+            print(msg)
+
+    def on_error(self, e, data=None):
+        if not self.stop:
+            self.error = e
+            print('{}: Channel(s) {}: {} - data: {}'.format(
+                datetime.datetime.now(), ', '.join(self.channels or []), e, data))
+
+
+async def run_clients(clients):
+    """ Run several `AsyncWebsocketClient`s on the current event loop over one shared session. """
+    if aiohttp is None:
+        raise ImportError('AsyncWebsocketClient requires aiohttp')
+    async with aiohttp.ClientSession() as session:
+        for client in clients:
+            if client.session is None:
+                client.session = session
+        await asyncio.gather(*[client.run() for client in clients])
+
+
+if __name__ == "__main__":
+    class TickerCounter(AsyncWebsocketClient):
+        def on_open(self):
+            self.message_count = 0
+            print("Let's count the messages!")
+
+        def on_message(self, msg):
+            self.message_count += 1
+
+    clients = [TickerCounter(products=[product], channels=['ticker']) for product in ['BTC-USD', 'ETH-USD']]
+    try:
+        asyncio.run(run_clients(clients))
+    except KeyboardInterrupt:
+        pass
@@ -14,16 +14,18 @@ import json
 from requests.auth import AuthBase
 from Connections.gdax.public_client import PublicClient
 from Connections.gdax.gdax_auth import GdaxAuth
+from Connections.gdax.scheduler import ORDER, ACCOUNT
 
 
 class AuthenticatedClient(PublicClient):
-    def __init__(self, key, b64secret, passphrase, url="https://api.gdax.com", timeout=30):
-        super(AuthenticatedClient, self).__init__(url)
+    def __init__(self, key, b64secret, passphrase, url="https://api.gdax.com", timeout=30, session=None,
+                 scheduler=None):
+        super(AuthenticatedClient, self).__init__(url, session=session, scheduler=scheduler)
         self.auth = GdaxAuth(key, b64secret, passphrase)
         self.timeout = timeout
 
     def get_account(self, account_id):
-        r = requests.get(self.url + '/accounts/' + account_id, auth=self.auth, timeout=self.timeout)
+        r = self._request('GET', self.url + '/accounts/' + account_id, auth=self.auth, timeout=self.timeout, priority=ACCOUNT)
         # r.raise_for_status()
         return r.json()
 
@@ -31,49 +33,38 @@ class AuthenticatedClient(PublicClient):
         return self.get_account('')
 
     def get_account_history(self, account_id):
-        result = []
-        r = requests.get(self.url + '/accounts/{}/ledger'.format(account_id), auth=self.auth, timeout=self.timeout)
-        # r.raise_for_status()
-        result.append(r.json())
-        if "cb-after" in r.headers:
-            self.history_pagination(account_id, result, r.headers["cb-after"])
-        return result
+        return list(self._pages('/accounts/{}/ledger'.format(account_id)))
 
     def history_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/ledger?after={}'.format(account_id, str(after)), auth=self.auth, timeout=self.timeout)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if "cb-after" in r.headers:
-            self.history_pagination(account_id, result, r.headers["cb-after"])
+        result.extend(self._pages('/accounts/{}/ledger'.format(account_id), {'after': str(after)}, first=False))
         return result
 
+    def iter_account_history(self, account_id, checkpoint=None, pages=False):
+        """Ledger entries of an account, newest first, fetched a page at a time.
+
+        See `iter_fills` for `checkpoint` and `pages`.
+        """
+        return self._iter('/accounts/{}/ledger'.format(account_id), None, checkpoint, pages)
+
     def get_account_holds(self, account_id):
-        result = []
-        r = requests.get(self.url + '/accounts/{}/holds'.format(account_id), auth=self.auth, timeout=self.timeout)
-        # r.raise_for_status()
-        result.append(r.json())
-        if "cb-after" in r.headers:
-            self.holds_pagination(account_id, result, r.headers["cb-after"])
-        return result
+        return list(self._pages('/accounts/{}/holds'.format(account_id)))
 
     def holds_pagination(self, account_id, result, after):
-        r = requests.get(self.url + '/accounts/{}/holds?after={}'.format(account_id, str(after)), auth=self.auth, timeout=self.timeout)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if "cb-after" in r.headers:
-            self.holds_pagination(account_id, result, r.headers["cb-after"])
+        result.extend(self._pages('/accounts/{}/holds'.format(account_id), {'after': str(after)}, first=False))
         return result
 
+    def iter_account_holds(self, account_id, pages=False):
+        return self._iter('/accounts/{}/holds'.format(account_id), None, None, pages)
+
     def buy(self, product_id, **kwargs):
         kwargs["side"] = "buy"
         if "product_id" not in kwargs:
             kwargs["product_id"] = product_id
-        r = requests.post(self.url + '/orders',
+        r = self._request('POST', self.url + '/orders',
                           data=json.dumps(kwargs),
                           auth=self.auth,
-                          timeout=self.timeout)
+                          timeout=self.timeout,
+                          priority=ORDER)
         if r.status_code is not 200:
             print("{}: buy: Server HTTP response code {}".format(datetime.datetime.now(),r.status_code))   
             # print(r.json())
@@ -86,10 +77,11 @@ class AuthenticatedClient(PublicClient):
         kwargs["side"] = "sell"
         if "product_id" not in kwargs:
             kwargs["product_id"] = product_id
-        r = requests.post(self.url + '/orders',
+        r = self._request('POST', self.url + '/orders',
                           data=json.dumps(kwargs),
                           auth=self.auth,
-                          timeout=self.timeout)
+                          timeout=self.timeout,
+                          priority=ORDER)
         if r.status_code is not 200:
             print("{}: sell: Server HTTP response code {}".format(datetime.datetime.now(),r.status_code))
             # print(r.json())
@@ -99,7 +91,7 @@ class AuthenticatedClient(PublicClient):
         return r.json()
 
     def cancel_order(self, order_id):
-        r = requests.delete(self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout)
+        r = self._request('DELETE', self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout, priority=ORDER)
         # r.raise_for_status()
         return r.json()
 
@@ -108,81 +100,131 @@ class AuthenticatedClient(PublicClient):
         params = {}
         if product_id:
             params["product_id"] = product_id
-        r = requests.delete(url, auth=self.auth, params=params, timeout=self.timeout)
+        r = self._request('DELETE', url, auth=self.auth, params=params, timeout=self.timeout, priority=ORDER)
         # r.raise_for_status()
         return r.json()
 
     def get_order(self, order_id):
-        r = requests.get(self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout)
+        r = self._request('GET', self.url + '/orders/' + order_id, auth=self.auth, timeout=self.timeout, priority=ACCOUNT)
         # r.raise_for_status()
         return r.json()
 
     def get_orders(self, product_id='', status=[]):
-        result = []
-        url = self.url + '/orders/'
-        params = {}
-        if product_id:
-            params["product_id"] = product_id
-        if status:
-            params["status"] = status
-        r = requests.get(url, auth=self.auth, params=params, timeout=self.timeout)
-        # r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.paginate_orders(product_id, status, result, r.headers['cb-after'])
-        return result
+        return list(self._pages('/orders', self._order_params(product_id, status)))
 
     def paginate_orders(self, product_id, status, result, after):
-        url = self.url + '/orders'
+        params = self._order_params(product_id, status)
+        params['after'] = str(after)
+        result.extend(self._pages('/orders', params, first=False))
+        return result
+
+    def iter_orders(self, product_id='', status=[], pages=False):
+        """Orders, newest first, fetched a page at a time. See `iter_fills` for `pages`."""
+        return self._iter('/orders', self._order_params(product_id, status), None, pages)
 
-        params = {
-            "after": str(after),
-        }
+    def _order_params(self, product_id, status):
+        params = {}
         if product_id:
             params["product_id"] = product_id
         if status:
             params["status"] = status
-        r = requests.get(url, auth=self.auth, params=params, timeout=self.timeout)
-        # r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            self.paginate_orders(product_id, status, result, r.headers['cb-after'])
-        return result
+        return params
 
     def get_fills(self, order_id='', product_id='', before='', after='', limit=''):
-        result = []
-        url = self.url + '/fills?'
-        if order_id:
-            url += "order_id={}&".format(str(order_id))
-        if product_id:
-            url += "product_id={}&".format(product_id)
+        params = self._fill_params(order_id, product_id)
         if before:
-            url += "before={}&".format(str(before))
+            params["before"] = str(before)
         if after:
-            url += "after={}&".format(str(after))
+            params["after"] = str(after)
         if limit:
-            url += "limit={}&".format(str(limit))
-        r = requests.get(url, auth=self.auth, timeout=self.timeout)
-        r.raise_for_status()
-        result.append(r.json())
-        if 'cb-after' in r.headers and limit is not len(r.json()):
-            return self.paginate_fills(result, r.headers['cb-after'], order_id=order_id, product_id=product_id)
+            params["limit"] = str(limit)
+        result = []
+        for page in self._pages('/fills', params, raise_for_status=True):
+            result.append(page)
+            if limit and len(result) == 1 and len(page) == int(limit):
+                break
         return result
 
     def paginate_fills(self, result, after, order_id='', product_id=''):
-        url = self.url + '/fills?after={}&'.format(str(after))
+        params = self._fill_params(order_id, product_id)
+        params['after'] = str(after)
+        result.extend(self._pages('/fills', params, first=False, raise_for_status=True))
+        return result
+
+    def iter_fills(self, order_id='', product_id='', checkpoint=None, pages=False):
+        """Fills, fetched lazily a page at a time.
+
+        Args:
+            order_id (Optional[str]): Only fills of this order.
+            product_id (Optional[str]): Only fills of this product.
+            checkpoint (Optional[PaginationCheckpoint]): Remembers the newest
+                fill returned. The first run walks the whole history, newest
+                first; later runs only return fills newer than the checkpoint,
+                oldest page first. The checkpoint only advances past pages the
+                caller has finished iterating over.
+            pages (Optional[bool]): Yield whole pages (lists) instead of fills.
+
+        """
+        return self._iter('/fills', self._fill_params(order_id, product_id), checkpoint, pages)
+
+    def _fill_params(self, order_id, product_id):
+        params = {}
         if order_id:
-            url += "order_id={}&".format(str(order_id))
+            params["order_id"] = str(order_id)
         if product_id:
-            url += "product_id={}&".format(product_id)
-        r = requests.get(url, auth=self.auth, timeout=self.timeout)
-        r.raise_for_status()
-        if r.json():
-            result.append(r.json())
-        if 'cb-after' in r.headers:
-            return self.paginate_fills(result, r.headers['cb-after'], order_id=order_id, product_id=product_id)
-        return result
+            params["product_id"] = product_id
+        return params
+
+    def _pages(self, path, params=None, first=True, raise_for_status=False, checkpoint=None):
+        """Pages of a cursor paginated endpoint, fetched one request at a time.
+
+        Without a checkpoint cursor, `cb-after` is followed back to the oldest
+        page; the first page is yielded even when empty (if `first`), later
+        empty pages end the iteration. With one, `cb-before` is followed
+        forward from the cursor until no newer records are left.
+        """
+        params = dict(params or {})
+        key = path + '?' + '&'.join('{}={}'.format(k, params[k]) for k in sorted(params))
+        cursor = checkpoint.get(key) if checkpoint is not None else None
+        if cursor is not None:
+            params.pop('after', None)
+            params['before'] = cursor
+        newest = None
+        while True:
+            r = self._request('GET', self.url + path, auth=self.auth, params=params, timeout=self.timeout,
+                              priority=ACCOUNT)
+            if raise_for_status:
+                r.raise_for_status()
+            page = r.json()
+            if page or first:
+                yield page
+            first = False
+            if not page or not isinstance(page, list):
+                break
+            if cursor is not None:
+                # Newer records: the page has been consumed, so advance the checkpoint past it
+                cursor = r.headers.get('cb-before')
+                if cursor is None:
+                    break
+                checkpoint.set(key, cursor)
+                params['before'] = cursor
+            else:
+                if newest is None:
+                    newest = r.headers.get('cb-before')
+                if 'cb-after' not in r.headers:
+                    break
+                params.pop('before', None)
+                params['after'] = r.headers['cb-after']
+        if checkpoint is not None and cursor is None and newest is not None:
+            checkpoint.set(key, newest)
+
+    def _iter(self, path, params, checkpoint, pages):
+        for page in self._pages(path, params, raise_for_status=True, checkpoint=checkpoint):
+            if pages:
+                yield page
+            else:
+                for record in page:
+                    yield record
 
     def get_fundings(self, result='', status='', after=''):
         pass
@@ -193,7 +235,7 @@ class AuthenticatedClient(PublicClient):
         #     url += "status={}&".format(str(status))
         # if after:
         #     url += 'after={}&'.format(str(after))
-        # r = requests.get(url, auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(url, auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # result.append(r.json())
         # if 'cb-after' in r.headers:
@@ -206,7 +248,7 @@ class AuthenticatedClient(PublicClient):
         #     "amount": amount,
         #     "currency": currency  # example: USD
         # }
-        # r = requests.post(self.url + "/funding/repay", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/funding/repay", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -218,13 +260,13 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,  # example: USD
         #     "amount": amount
         # }
-        # r = requests.post(self.url + "/profiles/margin-transfer", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/profiles/margin-transfer", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_position(self):
         pass
-        # r = requests.get(self.url + "/position", auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(self.url + "/position", auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -233,7 +275,7 @@ class AuthenticatedClient(PublicClient):
         # payload = {
         #     "repay_only": repay_only or False
         # }
-        # r = requests.post(self.url + "/position/close", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/position/close", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -244,7 +286,7 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,
         #     "payment_method_id": payment_method_id
         # }
-        # r = requests.post(self.url + "/deposits/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/deposits/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -255,7 +297,7 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,
         #     "coinbase_account_id": coinbase_account_id
         # }
-        # r = requests.post(self.url + "/deposits/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/deposits/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -266,7 +308,7 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,
         #     "payment_method_id": payment_method_id
         # }
-        # r = requests.post(self.url + "/withdrawals/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/withdrawals/payment-method", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -277,7 +319,7 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,
         #     "coinbase_account_id": coinbase_account_id
         # }
-        # r = requests.post(self.url + "/withdrawals/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/withdrawals/coinbase-account", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -288,19 +330,19 @@ class AuthenticatedClient(PublicClient):
         #     "currency": currency,
         #     "crypto_address": crypto_address
         # }
-        # r = requests.post(self.url + "/withdrawals/crypto", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/withdrawals/crypto", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_payment_methods(self):
         pass
-        # r = requests.get(self.url + "/payment-methods", auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(self.url + "/payment-methods", auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_coinbase_accounts(self):
         pass
-        # r = requests.get(self.url + "/coinbase-accounts", auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(self.url + "/coinbase-accounts", auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
@@ -316,24 +358,24 @@ class AuthenticatedClient(PublicClient):
         #     "format": report_format,
         #     "email": email
         # }
-        # r = requests.post(self.url + "/reports", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + "/reports", data=json.dumps(payload), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_report(self, report_id=""):
         pass
-        # r = requests.get(self.url + "/reports/" + report_id, auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(self.url + "/reports/" + report_id, auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_trailing_volume(self):
         pass
-        # r = requests.get(self.url + "/users/self/trailing-volume", auth=self.auth, timeout=self.timeout)
+        # r = self.session.get(self.url + "/users/self/trailing-volume", auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
 
     def get_deposit_address(self, account_id):
         pass
-        # r = requests.post(self.url + '/coinbase-accounts/{}/addresses'.format(account_id), auth=self.auth, timeout=self.timeout)
+        # r = self.session.post(self.url + '/coinbase-accounts/{}/addresses'.format(account_id), auth=self.auth, timeout=self.timeout)
         # # r.raise_for_status()
         # return r.json()
@@ -0,0 +1,157 @@
+#
+# gdax/candles.py
+#
+# Streaming OHLCV candles built from the websocket match feed
+
+import calendar
+import time
+
+import numpy as np
+import pandas as pd
+
+
+GRANULARITIES = (60, 300, 900, 3600, 21600, 86400)
+COLUMNS = ['time', 'low', 'high', 'open', 'close', 'volume']
+TIME, LOW, HIGH, OPEN, CLOSE, VOLUME = range(6)
+
+
+class CandleBuffer(object):
+    """Preallocated ring buffer of candles of one granularity.
+
+    Rows use the REST column order `[time, low, high, open, close, volume]`.
+    """
+
+    def __init__(self, granularity, capacity=1000):
+        self.granularity = granularity
+        self.capacity = capacity
+        self.data = np.full((capacity, len(COLUMNS)), np.nan)
+        self.count = 0
+        self.head = -1
+
+    def __len__(self):
+        return self.count
+
+    def last(self):
+        """Writable view of the newest candle, or None if empty."""
+        return self.data[self.head] if self.count else None
+
+    def last_time(self):
+        return self.data[self.head, TIME] if self.count else None
+
+    def append(self, row):
+        self.head = (self.head + 1) % self.capacity
+        self.data[self.head] = row
+        self.count = min(self.count + 1, self.capacity)
+
+    def load(self, rows):
+        """Replace the contents with `rows`, oldest first."""
+        rows = np.asarray(rows, dtype=float)[-self.capacity:]
+        self.data[:len(rows)] = rows
+        self.data[len(rows):] = np.nan
+        self.count = len(rows)
+        self.head = len(rows) - 1
+
+    def array(self):
+        """Copy of the candles, oldest first."""
+        if self.count < self.capacity:
+            return self.data[:self.count].copy()
+        start = self.head + 1
+        return np.concatenate((self.data[start:], self.data[:start]))
+
+    def frame(self):
+        return pd.DataFrame(self.array(), columns=COLUMNS)
+
+
+class CandleAggregator(object):
+    """Builds OHLCV candles for several granularities from `match` messages.
+
+    Each trade updates the forming candle of the smallest granularity, and every
+    larger candle is rolled up from the one below it in the same pass, so a single
+    trade costs a handful of scalar updates per granularity. Candles are kept in
+    preallocated `CandleBuffer`s.
+
+    REST is only used by `backfill`, at startup or when `needs_backfill` is set
+    after a gap in trade ids.
+
+    Args:
+        product_id (str): Product whose matches are aggregated.
+        granularities (Optional[tuple]): Candle sizes in seconds.
+        capacity (Optional[int]): Candles kept per granularity.
+
+    """
+
+    def __init__(self, product_id, granularities=GRANULARITIES, capacity=1000):
+        self.product_id = product_id
+        self.granularities = sorted(granularities)
+        self.buffers = {granularity: CandleBuffer(granularity, capacity) for granularity in self.granularities}
+        self._ordered = [self.buffers[granularity] for granularity in self.granularities]
+        self.last_trade_id = None
+        self.needs_backfill = True
+        self._second = (None, None)
+
+    def __getitem__(self, granularity):
+        return self.buffers[granularity]
+
+    def frame(self, granularity):
+        return self.buffers[granularity].frame()
+
+    def on_message(self, msg):
+        if msg.get('type') not in ('match', 'last_match') or msg.get('product_id') != self.product_id:
+            return
+        trade_id = msg.get('trade_id')
+        if trade_id is not None:
+            if self.last_trade_id is not None:
+                if trade_id <= self.last_trade_id:
+                    return
+                if trade_id > self.last_trade_id + 1:
+                    self.needs_backfill = True
+            self.last_trade_id = trade_id
+        self.add_trade(self._epoch(msg['time']), float(msg['price']), float(msg['size']))
+
+    def _epoch(self, iso):
+        # Trades arrive many per second, so the whole-second part is parsed once
+        second, epoch = self._second
+        if iso[:19] != second:
+            epoch = calendar.timegm(time.strptime(iso[:19], '%Y-%m-%dT%H:%M:%S'))
+            self._second = (iso[:19], epoch)
+        return epoch
+
+    def add_trade(self, timestamp, price, size):
+        finer = None
+        for buf in self._ordered:
+            start = timestamp - timestamp % buf.granularity
+            last_time = buf.last_time()
+            if last_time is None or start > last_time:
+                buf.append((start, price, price, price, price, size))
+                candle = buf.last()
+            elif start == last_time:
+                candle = buf.last()
+                if finer is None:
+                    candle[LOW] = min(candle[LOW], price)
+                    candle[HIGH] = max(candle[HIGH], price)
+                    candle[VOLUME] += size
+                else:
+                    candle[LOW] = min(candle[LOW], finer[LOW])
+                    candle[HIGH] = max(candle[HIGH], finer[HIGH])
+                    candle[VOLUME] += size
+                candle[CLOSE] = price
+            else:
+                # Older than the forming candle (e.g. replayed after a reconnect)
+                return
+            finer = candle
+
+    def backfill(self, client, granularities=None):
+        """Load the latest candles from REST and clear `needs_backfill`.
+
+        Candles are only replaced up to the newest REST candle, so trades already
+        aggregated into a newer forming candle are kept.
+        """
+        for granularity in granularities or self.granularities:
+            rows = client.get_product_historic_rates(self.product_id, granularity=granularity)
+            if not isinstance(rows, list) or not rows:
+                continue
+            rows = sorted(rows, key=lambda row: row[TIME])
+            buf = self.buffers[granularity]
+            forming = [candle for candle in buf.array() if candle[TIME] > rows[-1][TIME]]
+            buf.load([row[:len(COLUMNS)] for row in rows] + forming)
+        self.needs_backfill = False
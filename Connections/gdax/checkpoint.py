@@ -0,0 +1,53 @@
+#
+# gdax/checkpoint.py
+#
+# Pagination cursors persisted to a local file for incremental downloads
+
+import json
+import os
+import threading
+
+
+class PaginationCheckpoint(object):
+    """Newest pagination cursor seen per endpoint, stored in a JSON file.
+
+    Passed to the `AuthenticatedClient.iter_*` methods so that a later run only
+    fetches records newer than the ones already processed.
+
+    Args:
+        path (str): JSON file holding the cursors. Created on first save.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cursors = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._cursors = json.load(f)
+
+    def get(self, key):
+        return self._cursors.get(key)
+
+    def set(self, key, cursor):
+        with self._lock:
+            self._cursors[key] = cursor
+            self._save()
+
+    def reset(self, key=None):
+        """Forget the cursor of `key`, or all of them."""
+        with self._lock:
+            if key is None:
+                self._cursors.clear()
+            else:
+                self._cursors.pop(key, None)
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self._cursors, f)
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,181 @@
+#
+# gdax/decoder.py
+#
+# Pluggable JSON decoding for the gdax Websocket Feed. Uses orjson or msgspec
+# when installed and falls back to the standard library json module.
+
+import json
+from typing import List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def available_backends():
+    """Names of the installed decoder backends, fastest first."""
+    backends = []
+    if orjson is not None:
+        backends.append('orjson')
+    if msgspec is not None:
+        backends.append('msgspec')
+    backends.append('json')
+    return backends
+
+
+if msgspec is not None:
+
+    class Message(msgspec.Struct, tag_field='type', gc=False):
+        """ Typed feed message, decoded by msgspec straight from the frame.
+
+        Numeric fields the feed sends as strings are parsed to float while decoding,
+        so they are converted once, without an intermediate dict.
+
+        Supports the dict style access (`msg['price']`, `msg.get(...)`, `'price' in msg`)
+        used by the websocket handlers, so typed messages can be fed to them unchanged.
+        A field that was not present in the frame reads as None, and raises KeyError
+        through `msg[...]`.
+        """
+        sequence: Optional[int] = None
+        time: Optional[str] = None
+        product_id: Optional[str] = None
+
+        def __getitem__(self, key):
+            value = getattr(self, key, None)
+            if value is None:
+                raise KeyError(key)
+            return value
+
+        def get(self, key, default=None):
+            value = getattr(self, key, None)
+            return default if value is None else value
+
+        def __contains__(self, key):
+            return getattr(self, key, None) is not None
+
+        def keys(self):
+            return ['type'] + [field for field in self.__struct_fields__ if getattr(self, field) is not None]
+
+    class ReceivedMessage(Message, tag='received'):
+        order_id: Optional[str] = None
+        side: Optional[str] = None
+        order_type: Optional[str] = None
+        price: Optional[float] = None
+        size: Optional[float] = None
+        funds: Optional[float] = None
+        client_oid: Optional[str] = None
+
+    class OpenMessage(Message, tag='open'):
+        order_id: Optional[str] = None
+        side: Optional[str] = None
+        price: Optional[float] = None
+        remaining_size: Optional[float] = None
+
+    class DoneMessage(Message, tag='done'):
+        order_id: Optional[str] = None
+        side: Optional[str] = None
+        price: Optional[float] = None
+        remaining_size: Optional[float] = None
+        reason: Optional[str] = None
+
+    class MatchMessage(Message, tag='match'):
+        trade_id: Optional[int] = None
+        maker_order_id: Optional[str] = None
+        taker_order_id: Optional[str] = None
+        side: Optional[str] = None
+        price: Optional[float] = None
+        size: Optional[float] = None
+        user_id: Optional[str] = None
+        profile_id: Optional[str] = None
+        taker_fee_rate: Optional[float] = None
+        maker_fee_rate: Optional[float] = None
+
+    class LastMatchMessage(MatchMessage, tag='last_match'):
+        pass
+
+    class ChangeMessage(Message, tag='change'):
+        order_id: Optional[str] = None
+        side: Optional[str] = None
+        price: Optional[float] = None
+        new_size: Optional[float] = None
+        old_size: Optional[float] = None
+        new_funds: Optional[float] = None
+        old_funds: Optional[float] = None
+
+    class TickerMessage(Message, tag='ticker'):
+        trade_id: Optional[int] = None
+        side: Optional[str] = None
+        price: Optional[float] = None
+        last_size: Optional[float] = None
+        best_bid: Optional[float] = None
+        best_ask: Optional[float] = None
+        open_24h: Optional[float] = None
+        low_24h: Optional[float] = None
+        high_24h: Optional[float] = None
+        volume_24h: Optional[float] = None
+        volume_30d: Optional[float] = None
+
+    class L2UpdateMessage(Message, tag='l2update'):
+        """ `changes` is decoded to a list of `(side, price, size)` tuples. """
+        changes: List[Tuple[str, float, float]] = []
+
+    class HeartbeatMessage(Message, tag='heartbeat'):
+        last_trade_id: Optional[int] = None
+
+    MESSAGE_TYPES = {message_type.__struct_config__.tag: message_type for message_type in (
+        ReceivedMessage, OpenMessage, DoneMessage, MatchMessage, LastMatchMessage, ChangeMessage,
+        TickerMessage, L2UpdateMessage, HeartbeatMessage)}
+    for tag, message_type in MESSAGE_TYPES.items():
+        # The tag is not a struct field; a class attribute makes `msg.type`/`msg['type']` work
+        message_type.type = tag
+
+else:
+    MESSAGE_TYPES = {}
+
+
+class Decoder(object):
+    """Decodes raw websocket frames.
+
+    Args:
+        backend (Optional[str]): 'orjson', 'msgspec' or 'json'. Defaults to
+            the fastest installed backend.
+        typed (Optional[bool]): Return `Message` structs for the message
+            types in `MESSAGE_TYPES`, decoded by msgspec whatever the backend.
+            Other messages are returned as dicts. Requires msgspec.
+
+    """
+
+    def __init__(self, backend=None, typed=False):
+        self.backend = backend or available_backends()[0]
+        self.typed = typed
+        if self.backend == 'orjson':
+            if orjson is None:
+                raise ImportError('orjson is not installed')
+            self.loads = orjson.loads
+        elif self.backend == 'msgspec':
+            if msgspec is None:
+                raise ImportError('msgspec is not installed')
+            self.loads = msgspec.json.Decoder().decode
+        elif self.backend == 'json':
+            self.loads = json.loads
+        else:
+            raise ValueError('Unknown decoder backend {}'.format(self.backend))
+        if self.typed:
+            if msgspec is None:
+                raise ImportError('typed decoding requires msgspec')
+            self._typed = msgspec.json.Decoder(Union[tuple(MESSAGE_TYPES.values())], strict=False)
+
+    def decode(self, frame):
+        if self.typed:
+            try:
+                return self._typed.decode(frame)
+            except msgspec.ValidationError:
+                # Message type without a struct (snapshot, subscriptions, error, ...)
+                pass
+        return self.loads(frame)
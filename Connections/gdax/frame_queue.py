@@ -0,0 +1,106 @@
+#
+# gdax/frame_queue.py
+#
+# Bounded ring buffer between the websocket reader thread and the dispatcher threads
+
+import time
+from collections import deque
+from threading import Condition, Lock
+
+
+class QueueOverflow(Exception):
+    pass
+
+
+class FrameQueue(object):
+    """Bounded FIFO of raw websocket frames.
+
+    Args:
+        maxsize (Optional[int]): Frames held before the overflow policy applies.
+        overflow (Optional[str]): What `put` does when the queue is full:
+            * 'block': wait for a dispatcher to make room
+            * 'drop-oldest': discard the oldest queued frame
+            * 'disconnect': raise `QueueOverflow` so the reader can drop the
+              connection and resync
+
+    """
+
+    POLICIES = ('block', 'drop-oldest', 'disconnect')
+
+    def __init__(self, maxsize=10000, overflow='block'):
+        if overflow not in self.POLICIES:
+            raise ValueError('overflow must be one of {}'.format(', '.join(self.POLICIES)))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.closed = False
+        self._frames = deque()
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        self._not_full = Condition(self._lock)
+        self.enqueued = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame):
+        with self._lock:
+            if len(self._frames) >= self.maxsize:
+                self.overflows += 1
+                if self.overflow == 'block':
+                    while len(self._frames) >= self.maxsize and not self.closed:
+                        self._not_full.wait(1)
+                elif self.overflow == 'drop-oldest':
+                    self._frames.popleft()
+                    self.dropped += 1
+                else:
+                    raise QueueOverflow('{} frames waiting for dispatch'.format(len(self._frames)))
+            self._frames.append((time.time(), frame))
+            self.enqueued += 1
+            if len(self._frames) > self.max_depth:
+                self.max_depth = len(self._frames)
+            self._not_empty.notify()
+
+    def get(self, timeout=None):
+        """Oldest frame, or None if the queue is closed or `timeout` expires."""
+        with self._lock:
+            if not self._frames and not self.closed:
+                self._not_empty.wait(timeout)
+            if not self._frames:
+                return None
+            enqueued_at, frame = self._frames.popleft()
+            self.dispatched += 1
+            self.lag = time.time() - enqueued_at
+            if self.lag > self.max_lag:
+                self.max_lag = self.lag
+            self._not_full.notify()
+            return frame
+
+    def clear(self):
+        with self._lock:
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            self._not_full.notify_all()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def stats(self):
+        return {
+            'depth': len(self._frames),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'overflows': self.overflows,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+        }
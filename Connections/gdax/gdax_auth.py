@@ -2,36 +2,60 @@ import hmac
 import hashlib
 import time
 import base64
+from functools import lru_cache
 from requests.auth import AuthBase
 
 
+class Signer(object):
+    """Signs messages with an API secret, as required by https://docs.gdax.com/#signing-a-message
+
+    The secret is base64-decoded and keyed into an HMAC once; every signature
+    starts from a copy of that HMAC, so only the message itself is hashed.
+    Shared by REST (`GdaxAuth`) and websocket (`subscribe_params`) auth.
+    """
+
+    def __init__(self, secret_key):
+        self._hmac = hmac.new(base64.b64decode(secret_key), digestmod=hashlib.sha256)
+
+    def sign(self, message):
+        """Base64 HMAC-SHA256 signature of `message` (str or bytes)."""
+        signature = self._hmac.copy()
+        signature.update(message if isinstance(message, bytes) else message.encode('ascii'))
+        return base64.b64encode(signature.digest()).decode('utf-8')
+
+
+@lru_cache(maxsize=16)
+def get_signer(secret_key):
+    """`Signer` for `secret_key`, created once per secret."""
+    return Signer(secret_key)
+
+
 class GdaxAuth(AuthBase):
     # Provided by gdax: https://docs.gdax.com/#signing-a-message
     def __init__(self, api_key, secret_key, passphrase):
         self.api_key = api_key
         self.secret_key = secret_key
         self.passphrase = passphrase
+        self.signer = get_signer(secret_key)
 
     def __call__(self, request):
         timestamp = str(time.time())
         message = ''.join([timestamp, request.method,
                            request.path_url, (request.body or '')])
-        request.headers.update(get_auth_headers(timestamp, message,
-                                                self.api_key,
-                                                self.secret_key,
-                                                self.passphrase))
+        request.headers.update(auth_headers(self.signer, timestamp, message,
+                                            self.api_key, self.passphrase))
         return request
 
 
-def get_auth_headers(timestamp, message, api_key, secret_key, passphrase):
-    message = message.encode('ascii')
-    hmac_key = base64.b64decode(secret_key)
-    signature = hmac.new(hmac_key, message, hashlib.sha256)
-    signature_b64 = base64.b64encode(signature.digest()).decode('utf-8')
+def auth_headers(signer, timestamp, message, api_key, passphrase):
     return {
         'Content-Type': 'Application/JSON',
-        'CB-ACCESS-SIGN': signature_b64,
+        'CB-ACCESS-SIGN': signer.sign(message),
         'CB-ACCESS-TIMESTAMP': timestamp,
         'CB-ACCESS-KEY': api_key,
         'CB-ACCESS-PASSPHRASE': passphrase
     }
+
+
+def get_auth_headers(timestamp, message, api_key, secret_key, passphrase):
+    return auth_headers(get_signer(secret_key), timestamp, message, api_key, passphrase)
@@ -0,0 +1,178 @@
+#
+# gdax/historic_rates.py
+#
+# Paginated, parallel historic candle backfill with an on-disk cache
+
+import calendar
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from Connections.gdax.public_client import PublicClient
+
+
+COLUMNS = ['time', 'low', 'high', 'open', 'close', 'volume']
+
+
+class HistoricRates(object):
+    """Fetches any range of candles, 300 at a time, and caches them on disk.
+
+    The parts of a requested range that are not in the cache yet are split
+    into windows on a fixed grid of `MAX_CANDLES` candles (aligned to
+    multiples of `MAX_CANDLES * granularity`), so overlapping requests never
+    download the same candles twice. The windows are fetched on a thread
+    pool no faster than `rate` requests per second, merged with the cache,
+    deduplicated by time and saved as one `.npy` file per product and
+    granularity (loaded memory mapped), next to a `.json` list of the time
+    ranges already covered.
+
+    Args:
+        client (Optional[PublicClient]): Client used for the REST calls.
+        cache_dir (Optional[str]): Directory of the cache files.
+        max_workers (Optional[int]): Concurrent requests.
+        rate (Optional[float]): Maximum requests per second.
+        retries (Optional[int]): Attempts per window on HTTP 429 / network errors.
+
+    """
+
+    MAX_CANDLES = 300
+
+    def __init__(self, client=None, cache_dir='candles', max_workers=3, rate=3.0, retries=5):
+        self.client = client if client else PublicClient()
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.rate = rate
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+    def fetch(self, product_id, start, end, granularity=60):
+        """Candles with `start <= time < end` as an array of `COLUMNS`, oldest first.
+
+        Args:
+            product_id (str): Product
+            start, end (datetime, ISO 8601 str or epoch seconds): Range to return.
+            granularity (int): Candle size in seconds.
+
+        """
+        start = _epoch(start) // granularity * granularity
+        end = -(-_epoch(end) // granularity) * granularity
+        candles, covered = self._load(product_id, granularity)
+        windows = self._windows(start, end, granularity, covered)
+        if windows:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                fetched = list(pool.map(lambda window: self._fetch_window(product_id, granularity, *window), windows))
+            horizon = time.time() - granularity
+            candles = _merge(fetched + [candles])
+            covered = _union(covered + [list(window) for window in windows if window[1] <= horizon])
+            self._save(product_id, granularity, candles, covered)
+        mask = (candles[:, 0] >= start) & (candles[:, 0] < end)
+        return np.array(candles[mask])
+
+    def frame(self, product_id, start, end, granularity=60):
+        return pd.DataFrame(self.fetch(product_id, start, end, granularity), columns=COLUMNS)
+
+    def _windows(self, start, end, granularity, covered=()):
+        step = self.MAX_CANDLES * granularity
+        return [(max(window, lo), min(window + step, hi))
+                for lo, hi in _gaps(covered, start, end)
+                for window in range(lo // step * step, hi, step)]
+
+    def _throttle(self):
+        with self._lock:
+            now = time.time()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + 1.0 / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def _fetch_window(self, product_id, granularity, start, end):
+        delay = 1.0
+        for attempt in range(self.retries):
+            self._throttle()
+            try:
+                rows = self.client.get_product_historic_rates(
+                    product_id, start=_iso(start), end=_iso(end - granularity), granularity=granularity)
+            except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as e:
+                if attempt + 1 == self.retries:
+                    raise
+                print('{} {}: {}, retrying in {:.0f} seconds'.format(product_id, _iso(start), e, delay))
+                time.sleep(delay)
+                delay *= 2
+                continue
+            if isinstance(rows, dict):
+                raise Exception('Failed to fetch {} candles at {}: {}'.format(product_id, _iso(start), rows))
+            rows = np.array([row[:len(COLUMNS)] for row in rows], dtype=float).reshape(-1, len(COLUMNS))
+            return rows[(rows[:, 0] >= start) & (rows[:, 0] < end)]
+
+    def _path(self, product_id, granularity):
+        return os.path.join(self.cache_dir, '{}-{}'.format(product_id, granularity))
+
+    def _load(self, product_id, granularity):
+        path = self._path(product_id, granularity)
+        if not os.path.exists(path + '.npy') or not os.path.exists(path + '.json'):
+            return np.empty((0, len(COLUMNS))), []
+        with open(path + '.json') as f:
+            covered = json.load(f)
+        return np.load(path + '.npy', mmap_mode='r'), covered
+
+    def _save(self, product_id, granularity, candles, covered):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        path = self._path(product_id, granularity)
+        with open(path + '.tmp.npy', 'wb') as f:
+            np.save(f, candles)
+        os.replace(path + '.tmp.npy', path + '.npy')
+        with open(path + '.tmp.json', 'w') as f:
+            json.dump(covered, f)
+        os.replace(path + '.tmp.json', path + '.json')
+
+
+def _merge(chunks):
+    """Concatenate candle arrays, keeping the first occurrence of each time, sorted by time."""
+    candles = np.concatenate([np.asarray(chunk, dtype=float).reshape(-1, len(COLUMNS)) for chunk in chunks])
+    _, first = np.unique(candles[:, 0], return_index=True)
+    return candles[first]
+
+
+def _union(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _gaps(covered, start, end):
+    """Sub-ranges of `[start, end)` outside the sorted, disjoint `covered` ranges."""
+    gaps = []
+    for lo, hi in covered:
+        if hi <= start or lo >= end:
+            continue
+        if lo > start:
+            gaps.append((start, lo))
+        start = max(start, hi)
+    if start < end:
+        gaps.append((start, end))
+    return gaps
+
+
+def _epoch(value):
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple())
+    if isinstance(value, str):
+        return int(pd.Timestamp(value).timestamp())
+    return int(value)
+
+
+def _iso(epoch):
+    return datetime.datetime.utcfromtimestamp(epoch).strftime('%Y-%m-%dT%H:%M:%SZ')
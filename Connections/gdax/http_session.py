@@ -0,0 +1,43 @@
+#
+# gdax/http_session.py
+#
+# Pooled keep-alive HTTP sessions shared by the REST clients
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def create_session(pool_connections=4, pool_maxsize=16, pool_block=False, max_retries=0):
+    """Create a `requests.Session` with a tuned connection pool.
+
+    Args:
+        pool_connections (Optional[int]): Number of hosts to keep pools for.
+        pool_maxsize (Optional[int]): Keep-alive connections kept per host.
+        pool_block (Optional[bool]): Block when `pool_maxsize` connections to
+            a host are busy instead of opening extra throw-away ones, which
+            turns `pool_maxsize` into a hard per-host limit.
+        max_retries (Optional[int]): Connection level retries.
+
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                          pool_block=pool_block, max_retries=max_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def shared_session():
+    """Process wide session used by clients created without an explicit one."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = create_session()
+    return _shared
@@ -0,0 +1,153 @@
+#
+# gdax/level2_book.py
+#
+# Aggregated (level 2) order book kept up to date from the websocket `level2` channel
+
+import numpy as np
+import pandas as pd
+
+
+class _Side(object):
+    """Price levels of one side in preallocated arrays, best price first.
+
+    `keys` holds the price for asks and the negated price for bids so that both
+    sides sort ascending from the best level and `np.searchsorted` finds a level
+    in O(log n). Inserting or removing shifts the levels behind it in place.
+    """
+
+    def __init__(self, descending, capacity=1024):
+        self.sign = -1.0 if descending else 1.0
+        self.keys = np.empty(capacity)
+        self.levels = np.empty((capacity, 2))
+        self.count = 0
+
+    def _grow(self):
+        capacity = len(self.keys) * 2
+        keys, levels = np.empty(capacity), np.empty((capacity, 2))
+        keys[:self.count] = self.keys[:self.count]
+        levels[:self.count] = self.levels[:self.count]
+        self.keys, self.levels = keys, levels
+
+    def load(self, levels):
+        levels = np.asarray(levels, dtype=float).reshape(-1, 2)
+        levels = levels[levels[:, 1] > 0]
+        order = np.argsort(self.sign * levels[:, 0], kind='stable')
+        while len(self.keys) < len(levels):
+            self._grow()
+        self.count = len(levels)
+        self.levels[:self.count] = levels[order]
+        self.keys[:self.count] = self.sign * self.levels[:self.count, 0]
+
+    def update(self, price, size):
+        """Set the size of the level at `price`; a size of 0 removes it.
+
+        Returns:
+            int: Position of the level, best first.
+
+        """
+        key = self.sign * price
+        n = self.count
+        i = int(np.searchsorted(self.keys[:n], key))
+        exists = i < n and self.keys[i] == key
+        if size > 0:
+            if exists:
+                self.levels[i, 1] = size
+            else:
+                if n == len(self.keys):
+                    self._grow()
+                self.keys[i + 1:n + 1] = self.keys[i:n]
+                self.levels[i + 1:n + 1] = self.levels[i:n]
+                self.keys[i] = key
+                self.levels[i] = (price, size)
+                self.count += 1
+        elif exists:
+            self.keys[i:n - 1] = self.keys[i + 1:n]
+            self.levels[i:n - 1] = self.levels[i + 1:n]
+            self.count -= 1
+        return i
+
+    def view(self, depth=None):
+        view = self.levels[:self.count if depth is None else min(depth, self.count)]
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+
+class Level2Book(object):
+    """Level 2 book of one product built from `snapshot` and `l2update` messages.
+
+    Feed it every message of a `level2` subscription through `on_message` (it can
+    be called from `WebsocketClient.on_message`). No REST polling is needed.
+
+    `asks()`/`bids()` return read-only `(n, 2)` arrays of `[price, size]`, best
+    level first, that are views on the book (copy them to keep them across
+    updates). `dataframe()` builds, only when the book changed since the last
+    call, the frame `Level2Analysis` consumes: columns `side` ('asks' or
+    'bids'), `price` and `size`.
+
+    `version` increases on every change so consumers can cache derived results.
+    """
+
+    def __init__(self, product_id='BTC-USD', capacity=1024):
+        self.product_id = product_id
+        self._asks = _Side(descending=False, capacity=capacity)
+        self._bids = _Side(descending=True, capacity=capacity)
+        self.version = 0
+        self.ready = False
+        self.time = None
+        self._frame = None
+        self._frame_version = -1
+
+    def on_message(self, msg):
+        msg_type = msg.get('type')
+        if msg.get('product_id') != self.product_id:
+            return
+        if msg_type == 'snapshot':
+            self.load(msg['bids'], msg['asks'])
+        elif msg_type == 'l2update' and self.ready:
+            for side, price, size in msg['changes']:
+                self.update(side, float(price), float(size))
+            self.time = msg.get('time', self.time)
+
+    def load(self, bids, asks):
+        """Replace the book with `[price, size]` bid and ask levels (strings or numbers)."""
+        self._bids.load([level[:2] for level in bids])
+        self._asks.load([level[:2] for level in asks])
+        self.ready = True
+        self.version += 1
+
+    def update(self, side, price, size):
+        """Apply one level change; `side` is 'buy'/'bids' or 'sell'/'asks'."""
+        book = self._bids if side in ('buy', 'bids') else self._asks
+        self.version += 1
+        return book.update(price, size)
+
+    def asks(self, depth=None):
+        return self._asks.view(depth)
+
+    def bids(self, depth=None):
+        return self._bids.view(depth)
+
+    def best_ask(self):
+        return self._asks.levels[0, 0] if self._asks.count else None
+
+    def best_bid(self):
+        return self._bids.levels[0, 0] if self._bids.count else None
+
+    def spread(self):
+        if not self._asks.count or not self._bids.count:
+            return None
+        return self.best_ask() - self.best_bid()
+
+    def dataframe(self):
+        """Asks then bids, best level first, as columns `side`, `price`, `size`. Cached per `version`."""
+        if self._frame_version != self.version:
+            asks, bids = self.asks(), self.bids()
+            levels = np.concatenate((asks, bids))
+            self._frame = pd.DataFrame({
+                'side': np.repeat(np.array(['asks', 'bids'], dtype=object), [len(asks), len(bids)]),
+                'price': levels[:, 0],
+                'size': levels[:, 1],
+            })
+            self._frame_version = self.version
+        return self._frame
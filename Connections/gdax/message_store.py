@@ -0,0 +1,112 @@
+#
+# gdax/message_store.py
+#
+# Bounded store for persisted feed messages with sequence lookups and cursor reads
+
+import time
+from collections import deque
+from itertools import islice
+from threading import Lock
+
+
+class MessageStore(object):
+    """Append-only message buffer bounded by count and/or age.
+
+    Every appended message gets a cursor (a monotonically increasing position
+    that survives eviction), so consumers can remember where they stopped and
+    call `since(cursor)` to process only the new messages. Messages carrying a
+    `sequence` can also be looked up by `(product_id, sequence)`.
+
+    Iteration, `len()` and positional indexing behave like the list that
+    `WebsocketClient.data` used to be, over the messages still retained.
+
+    Args:
+        maxlen (Optional[int]): Maximum number of messages kept.
+        max_age (Optional[float]): Maximum age in seconds of kept messages.
+
+    """
+
+    def __init__(self, maxlen=100000, max_age=None):
+        self.maxlen = maxlen
+        self.max_age = max_age
+        self._messages = deque()
+        self._times = deque()
+        self._sequences = {}
+        self._first = 0
+        self._next = 0
+        self._lock = Lock()
+
+    def append(self, message):
+        now = time.time()
+        with self._lock:
+            self._messages.append(message)
+            self._times.append(now)
+            sequence = message.get('sequence')
+            if sequence is not None:
+                self._sequences[(message.get('product_id'), sequence)] = self._next
+            self._next += 1
+            self._evict(now)
+
+    def _evict(self, now):
+        messages = self._messages
+        while messages and ((self.maxlen is not None and len(messages) > self.maxlen) or
+                            (self.max_age is not None and self._times[0] < now - self.max_age)):
+            message = messages.popleft()
+            self._times.popleft()
+            sequence = message.get('sequence')
+            if sequence is not None:
+                key = (message.get('product_id'), sequence)
+                if self._sequences.get(key) == self._first:
+                    del self._sequences[key]
+            self._first += 1
+
+    @property
+    def cursor(self):
+        """Cursor that the next appended message will get."""
+        return self._next
+
+    @property
+    def first_cursor(self):
+        """Cursor of the oldest message still retained."""
+        return self._first
+
+    def since(self, cursor=0):
+        """Messages appended at or after `cursor` that are still retained.
+
+        Returns:
+            tuple: (list of messages, cursor to pass on the next call)
+
+        """
+        with self._lock:
+            # Walk from the newest end, so a read costs the number of new messages
+            count = self._next - max(cursor, self._first)
+            messages = list(islice(reversed(self._messages), max(count, 0)))
+            messages.reverse()
+            return messages, self._next
+
+    def get_by_sequence(self, sequence, product_id=None):
+        with self._lock:
+            position = self._sequences.get((product_id, sequence))
+            if position is None:
+                return None
+            return self._messages[position - self._first]
+
+    def clear(self):
+        with self._lock:
+            self._first = self._next
+            self._messages.clear()
+            self._times.clear()
+            self._sequences.clear()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._messages))
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return list(self._messages)[index]
+            return self._messages[index]
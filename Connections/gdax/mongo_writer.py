@@ -0,0 +1,130 @@
+#
+# gdax/mongo_writer.py
+#
+# Background, batched persistence of feed messages to a mongo collection
+
+from __future__ import print_function
+import datetime
+import time
+from queue import Queue, Empty
+from threading import Thread
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+
+_STOP = object()
+# Duplicate key: the document is already stored, e.g. by an attempt cut short by AutoReconnect
+DUPLICATE_KEY = 11000
+
+
+class MongoWriter(object):
+    """Writes documents to `collection` with `insert_many` from a background thread.
+
+    A batch is flushed once it holds `batch_size` documents or `flush_interval`
+    seconds after the previous flush, whichever comes first. `put` blocks when
+    `max_buffer` documents are waiting, which applies backpressure to the
+    producer instead of growing memory. Transient failures (`AutoReconnect`
+    and its subclasses) are retried with exponential backoff.
+
+    Works with any pymongo compatible collection, including mongomock.
+
+    Args:
+        collection: Target collection.
+        batch_size (Optional[int]): Documents per `insert_many` call.
+        flush_interval (Optional[float]): Maximum seconds a document waits.
+        max_buffer (Optional[int]): Documents queued before `put` blocks.
+        retries (Optional[int]): Attempts per batch before it is dropped.
+        retry_delay (Optional[float]): Delay before the first retry.
+
+    """
+
+    def __init__(self, collection, batch_size=500, flush_interval=1.0, max_buffer=50000, retries=5,
+                 retry_delay=0.5):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = Queue(maxsize=max_buffer)
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self.started = time.time()
+        self._last_stats = (self.started, 0)
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, document, timeout=None):
+        self.queue.put(document, timeout=timeout)
+
+    def close(self, timeout=None):
+        """Flush everything queued so far and stop the writer thread."""
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.time() + self.flush_interval
+        while True:
+            try:
+                document = self.queue.get(timeout=max(deadline - time.time(), 0))
+            except Empty:
+                document = None
+            if document is _STOP:
+                break
+            if document is not None:
+                batch.append(document)
+            if len(batch) >= self.batch_size or time.time() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.time() + self.flush_interval
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        delay = self.retry_delay
+        for attempt in range(self.retries):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+            except AutoReconnect as e:
+                if attempt + 1 == self.retries:
+                    break
+                self.retried += 1
+                print("{}: Mongo write failed ({}), retrying in {:.1f} seconds".format(datetime.datetime.now(), e, delay))
+                time.sleep(delay)
+                delay *= 2
+            except BulkWriteError as e:
+                # Unordered, so every document was attempted; only the non duplicate errors were not stored
+                errors = [error for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY]
+                if errors:
+                    print("{}: Mongo write failed for {} documents: {}".format(datetime.datetime.now(), len(errors), errors[0].get('errmsg')))
+                self.inserted += len(batch) - len(errors)
+                self.failed += len(errors)
+                self.batches += 1
+                return
+            except Exception as e:
+                print("{}: Mongo write failed: {}".format(datetime.datetime.now(), e))
+                break
+            else:
+                self.inserted += len(batch)
+                self.batches += 1
+                return
+        self.failed += len(batch)
+
+    def stats(self):
+        """Counters plus the insert rate per second since the previous call."""
+        now = time.time()
+        last_time, last_inserted = self._last_stats
+        self._last_stats = (now, self.inserted)
+        return {
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'batches': self.batches,
+            'retried': self.retried,
+            'buffered': self.queue.qsize(),
+            'per_second': (self.inserted - last_inserted) / max(now - last_time, 1e-9),
+            'average_per_second': self.inserted / max(now - self.started, 1e-9),
+        }
@@ -0,0 +1,53 @@
+#
+# gdax/multi_order_book.py
+#
+# Live order books for several products sharing one gdax Websocket Feed connection
+
+import pickle
+
+from Connections.gdax.order_book import OrderBook
+from Connections.gdax.websocket_client import WebsocketClient
+
+
+class MultiOrderBook(WebsocketClient):
+    """ Subscribes to the `full` channel of every product over a single websocket and
+    routes each message by `product_id` to that product's `OrderBook`.
+
+    The per-product books never open a socket of their own. Each one tracks its own
+    sequence number, so a gap on one product only re-initializes that book.
+    """
+
+    def __init__(self, product_ids=None, log_to=None, url="wss://ws-feed.gdax.com", **book_kwargs):
+        product_ids = list(product_ids or ['BTC-USD'])
+        super(MultiOrderBook, self).__init__(url=url, products=product_ids, channels=['full'])
+        self.books = {product_id: OrderBook(product_id=product_id, **book_kwargs) for product_id in product_ids}
+        self._log_to = log_to
+        if self._log_to:
+            assert hasattr(self._log_to, 'write')
+
+    def __getitem__(self, product_id):
+        return self.books[product_id]
+
+    def get_book(self, product_id):
+        return self.books[product_id]
+
+    @property
+    def sequences(self):
+        return {product_id: book.sequence for product_id, book in self.books.items()}
+
+    def on_open(self):
+        # A new connection may have missed messages for every product
+        for book in self.books.values():
+            book.resync()
+        print("-- Subscribed to OrderBooks {}! --\n".format(', '.join(self.books)))
+
+    def on_close(self):
+        print("\n-- MultiOrderBook Socket Closed! --")
+
+    def on_message(self, message):
+        book = self.books.get(message.get('product_id'))
+        if book is None:
+            return
+        if self._log_to:
+            pickle.dump(message, self._log_to)
+        book.on_message(message)
@@ -4,21 +4,34 @@
 #
 # Live order book updated from the gdax Websocket Feed
 
-from bintrees import RBTree
-from decimal import Decimal
 import pickle
+import time
+from collections import deque
+from threading import Thread
 
-from gdax.public_client import PublicClient
-from gdax.websocket_client import WebsocketClient
+from Connections.gdax.public_client import PublicClient
+from Connections.gdax.websocket_client import WebsocketClient
+from Connections.gdax.price_level_book import PriceLevelBook, BookSnapshot, from_ticks
 
 
 class OrderBook(WebsocketClient):
-    def __init__(self, product_id='BTC-USD', log_to=None):
-        super(OrderBook, self).__init__(products=product_id)
-        self._asks = RBTree()
-        self._bids = RBTree()
+    def __init__(self, product_id='BTC-USD', log_to=None, price_decimals=8, size_decimals=8, depth=50,
+                 max_buffered=100000):
+        super(OrderBook, self).__init__(products=[product_id or 'BTC-USD'], channels=['full'])
+        self._book = PriceLevelBook(price_decimals=price_decimals, size_decimals=size_decimals)
+        self.depth = depth
+        self._snapshot = None
         self._client = PublicClient()
         self._sequence = -1
+        self._recovery = None
+        self._recovery_result = None
+        self._pending = deque(maxlen=max_buffered)
+        self.metrics = {
+            'recoveries': 0,
+            'recovery_started': None,
+            'last_recovery_seconds': None,
+            'buffered_messages': 0,
+        }
         self._log_to = log_to
         if self._log_to:
             assert hasattr(self._log_to, 'write')
@@ -26,221 +39,214 @@ class OrderBook(WebsocketClient):
 
     @property
     def product_id(self):
-        ''' Currently OrderBook only supports a single product even though it is stored as a list of products. '''
+        ''' OrderBook tracks a single product, use MultiOrderBook to share one connection between several. '''
         return self.products[0]
 
-    def on_open(self):
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def resync(self):
+        ''' Re-initialize the book from the REST snapshot on the next message. '''
         self._sequence = -1
+        self._pending.clear()
+
+    def on_open(self):
+        self.resync()
         print("-- Subscribed to OrderBook! --\n")
 
     def on_close(self):
         print("\n-- OrderBook Socket Closed! --")
 
     def reset_book(self):
-        self._asks = RBTree()
-        self._bids = RBTree()
-        res = self._client.get_product_order_book(product_id=self.product_id, level=3)
+        ''' Synchronously reload the book from the level 3 REST snapshot. '''
+        self._load(self._client.get_product_order_book(product_id=self.product_id, level=3))
+
+    def _load(self, res):
+        self._book.clear()
         for bid in res['bids']:
             self.add({
                 'id': bid[2],
                 'side': 'buy',
-                'price': Decimal(bid[0]),
-                'size': Decimal(bid[1])
+                'price': bid[0],
+                'size': bid[1]
             })
         for ask in res['asks']:
             self.add({
                 'id': ask[2],
                 'side': 'sell',
-                'price': Decimal(ask[0]),
-                'size': Decimal(ask[1])
+                'price': ask[0],
+                'size': ask[1]
             })
         self._sequence = res['sequence']
+        self._publish(('buy', 'sell'))
 
     def on_message(self, message):
         if self._log_to:
             pickle.dump(message, self._log_to)
 
-        sequence = message['sequence']
+        sequence = message.get('sequence')
+        if sequence is None:
+            return
+        if self._recovery is not None:
+            self._pending.append(message)
+            self._finish_recovery()
+            return
         if self._sequence == -1:
-            self.reset_book()
+            self._start_recovery()
+            self._pending.append(message)
             return
         if sequence <= self._sequence:
             # ignore older messages (e.g. before order book initialization from getProductOrderBook)
             return
         elif sequence > self._sequence + 1:
             self.on_sequence_gap(self._sequence, sequence)
+            self._pending.append(message)
             return
+        self._apply(message)
 
+    def _apply(self, message):
         msg_type = message['type']
+        touched = None
         if msg_type == 'open':
-            self.add(message)
+            touched = self.add(message)
         elif msg_type == 'done' and 'price' in message:
-            self.remove(message)
+            touched = self.remove(message)
         elif msg_type == 'match':
-            self.match(message)
+            touched = self.match(message)
             self._current_ticker = message
         elif msg_type == 'change':
-            self.change(message)
+            touched = self.change(message)
 
-        self._sequence = sequence
+        self._sequence = message['sequence']
+        if touched is not None and self._book.in_top(touched[0], touched[1], self.depth):
+            self._publish((touched[0],))
+        else:
+            self._publish(())
 
     def on_sequence_gap(self, gap_start, gap_end):
-        self.reset_book()
-        print('Error: messages missing ({} - {}). Re-initializing book at sequence {}.'.format(
-            gap_start, gap_end, self._sequence))
-
-
-    def add(self, order):
-        order = {
-            'id': order.get('order_id') or order['id'],
-            'side': order['side'],
-            'price': Decimal(order['price']),
-            'size': Decimal(order.get('size') or order['remaining_size'])
-        }
-        if order['side'] == 'buy':
-            bids = self.get_bids(order['price'])
-            if bids is None:
-                bids = [order]
-            else:
-                bids.append(order)
-            self.set_bids(order['price'], bids)
-        else:
-            asks = self.get_asks(order['price'])
-            if asks is None:
-                asks = [order]
-            else:
-                asks.append(order)
-            self.set_asks(order['price'], asks)
+        self._start_recovery()
+        print('Error: messages missing ({} - {}). Re-initializing book in the background.'.format(
+            gap_start, gap_end))
+
+    def _start_recovery(self):
+        ''' Fetch the level 3 snapshot on a worker thread while messages are buffered.
+
+        The receive loop keeps reading the socket; the snapshot is applied, and the
+        buffered messages after its sequence replayed, by the next on_message call
+        once the worker is done.
+        '''
+        if self._recovery is not None:
+            return
+        if self.metrics['recovery_started'] is None:
+            self.metrics['recovery_started'] = time.time()
+        self._recovery_result = None
 
-    def remove(self, order):
-        price = Decimal(order['price'])
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if bids is not None:
-                bids = [o for o in bids if o['id'] != order['order_id']]
-                if len(bids) > 0:
-                    self.set_bids(price, bids)
-                else:
-                    self.remove_bids(price)
-        else:
-            asks = self.get_asks(price)
-            if asks is not None:
-                asks = [o for o in asks if o['id'] != order['order_id']]
-                if len(asks) > 0:
-                    self.set_asks(price, asks)
-                else:
-                    self.remove_asks(price)
+        def _fetch():
+            try:
+                self._recovery_result = self._client.get_product_order_book(product_id=self.product_id, level=3)
+            except Exception as e:
+                self._recovery_result = e
 
-    def match(self, order):
-        size = Decimal(order['size'])
-        price = Decimal(order['price'])
+        self._recovery = Thread(target=_fetch)
+        self._recovery.daemon = True
+        self._recovery.start()
 
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if not bids:
-                return
-            assert bids[0]['id'] == order['maker_order_id']
-            if bids[0]['size'] == size:
-                self.set_bids(price, bids[1:])
-            else:
-                bids[0]['size'] -= size
-                self.set_bids(price, bids)
-        else:
-            asks = self.get_asks(price)
-            if not asks:
-                return
-            assert asks[0]['id'] == order['maker_order_id']
-            if asks[0]['size'] == size:
-                self.set_asks(price, asks[1:])
-            else:
-                asks[0]['size'] -= size
-                self.set_asks(price, asks)
-
-    def change(self, order):
-        try:
-            new_size = Decimal(order['new_size'])
-        except KeyError:
+    def _finish_recovery(self):
+        res = self._recovery_result
+        if res is None:
             return
-
-        try:
-            price = Decimal(order['price'])
-        except KeyError:
+        self._recovery = None
+        self.metrics['buffered_messages'] = len(self._pending)
+        if isinstance(res, Exception):
+            print('Error: failed to fetch the {} order book ({}). Retrying.'.format(self.product_id, res))
+            self._start_recovery()
             return
 
-        if order['side'] == 'buy':
-            bids = self.get_bids(price)
-            if bids is None or not any(o['id'] == order['order_id'] for o in bids):
-                return
-            index = [b['id'] for b in bids].index(order['order_id'])
-            bids[index]['size'] = new_size
-            self.set_bids(price, bids)
-        else:
-            asks = self.get_asks(price)
-            if asks is None or not any(o['id'] == order['order_id'] for o in asks):
+        self._load(res)
+        pending, self._pending = self._pending, deque(maxlen=self._pending.maxlen)
+        for message in pending:
+            if message['sequence'] <= self._sequence:
+                continue
+            if message['sequence'] > self._sequence + 1:
+                # The buffer overflowed or the feed skipped messages while we waited
+                self._pending = pending
+                self.on_sequence_gap(self._sequence, message['sequence'])
                 return
-            index = [a['id'] for a in asks].index(order['order_id'])
-            asks[index]['size'] = new_size
-            self.set_asks(price, asks)
+            self._apply(message)
+
+        self.metrics['recoveries'] += 1
+        self.metrics['last_recovery_seconds'] = time.time() - self.metrics['recovery_started']
+        self.metrics['recovery_started'] = None
+        print('-- {} order book initialized at sequence {} after {:.2f}s, {} buffered messages --'.format(
+            self.product_id, self._sequence, self.metrics['last_recovery_seconds'], self.metrics['buffered_messages']))
+
+    def _publish(self, sides):
+        """ Publish a new snapshot, rebuilding only the sides whose top levels changed.
+
+        The snapshot is swapped in with a single attribute assignment, so readers on
+        other threads always see a consistent (sequence, bids, asks) triple without locking.
+        """
+        previous = self._snapshot
+        if previous is None:
+            sides = ('buy', 'sell')
+        bids = self._book.top('buy', self.depth) if 'buy' in sides else previous.bids
+        asks = self._book.top('sell', self.depth) if 'sell' in sides else previous.asks
+        self._snapshot = BookSnapshot(self._sequence, bids, asks)
+
+    def get_snapshot(self):
+        """ Latest top of book as a `BookSnapshot` of read-only NumPy structured arrays
+        (fields price, size, orders) holding the `depth` best levels per side. """
+        return self._snapshot
+
+    def add(self, order):
+        return self._book.add(order)
 
-        tree = self._asks if order['side'] == 'sell' else self._bids
-        node = tree.get(price)
+    def remove(self, order):
+        return self._book.remove(order)
 
-        if node is None or not any(o['id'] == order['order_id'] for o in node):
-            return
+    def match(self, order):
+        return self._book.match(order)
+
+    def change(self, order):
+        return self._book.change(order)
 
     def get_current_ticker(self):
         return self._current_ticker
 
-    def get_current_book(self):
-        result = {
-            'sequence': self._sequence,
-            'asks': [],
-            'bids': [],
+    def get_current_book(self, retries=10):
+        """ Every resting order as [price, size, order_id] lists, bids and asks in ascending price order.
+
+        Walks the whole book on the caller's thread while the websocket thread keeps
+        applying messages, so the walk is repeated until no message was applied during
+        it, at most `retries` times; the last walk is returned even if it was not
+        consistent. Poll `get_snapshot()` instead when the top of book is enough.
+        """
+        book = self._book
+        for _ in range(retries):
+            sequence = self._sequence
+            sides = [list(book.orders(side)) for side in ('sell', 'buy')]
+            if self._sequence == sequence:
+                break
+        asks, bids = [[[from_ticks(price, book.price_decimals), from_ticks(size, book.size_decimals), order_id]
+                       for price, order_id, size in orders] for orders in sides]
+        return {
+            'sequence': sequence,
+            'asks': asks,
+            'bids': bids,
         }
-        for ask in self._asks:
-            try:
-                # There can be a race condition here, where a price point is removed
-                # between these two ops
-                this_ask = self._asks[ask]
-            except KeyError:
-                continue
-            for order in this_ask:
-                result['asks'].append([order['price'], order['size'], order['id']])
-        for bid in self._bids:
-            try:
-                # There can be a race condition here, where a price point is removed
-                # between these two ops
-                this_bid = self._bids[bid]
-            except KeyError:
-                continue
-
-            for order in this_bid:
-                result['bids'].append([order['price'], order['size'], order['id']])
-        return result
 
     def get_ask(self):
-        return self._asks.min_key()
+        return self._book.get_ask()
 
     def get_asks(self, price):
-        return self._asks.get(price)
-
-    def remove_asks(self, price):
-        self._asks.remove(price)
-
-    def set_asks(self, price, asks):
-        self._asks.insert(price, asks)
+        return self._book.get_asks(price)
 
     def get_bid(self):
-        return self._bids.max_key()
+        return self._book.get_bid()
 
     def get_bids(self, price):
-        return self._bids.get(price)
-
-    def remove_bids(self, price):
-        self._bids.remove(price)
-
-    def set_bids(self, price, bids):
-        self._bids.insert(price, bids)
+        return self._book.get_bids(price)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,179 @@
+#
+# gdax/order_tracker.py
+#
+# Event driven state of our orders built from the websocket `user` channel
+
+import numpy as np
+import pandas as pd
+
+
+class OrderTracker(object):
+    """Keeps order_id keyed state for every order seen on the `user` channel.
+
+    Each `received/open/match/done/activate/change` message is applied exactly
+    once. `dataframe()` returns a cached frame with one row per order, and
+    only the rows of orders changed since the previous call are rebuilt. Rows
+    live in preallocated column arrays (grown by doubling) that the frame is
+    built on without copying, so the cost follows the changed orders rather
+    than the total number of orders.
+
+    Besides the order fields the frame has, per currency of the product, the
+    net balance change of the order's fills (e.g. `BTC` and `USD` columns)
+    and the amount currently on hold (`currency_on_hold`, `on_hold`), which
+    is what `AccountManager` consumes.
+    """
+
+    COLUMNS = ['order_id', 'product_id', 'side', 'order_type', 'status', 'reason', 'price', 'stop_price', 'size',
+               'funds', 'filled_size', 'executed_value', 'remaining_size', 'time', 'done_at',
+               'currency_on_hold', 'on_hold']
+    FLOATS = {'price', 'stop_price', 'size', 'funds', 'filled_size', 'executed_value', 'remaining_size', 'on_hold'}
+
+    def __init__(self, capacity=1024):
+        self.orders = {}
+        self.cursor = 0
+        self._frame = pd.DataFrame([], columns=self.COLUMNS)
+        self._dirty = set()
+        self._currencies = []
+        self._rows = {}
+        self._ids = np.empty(capacity, dtype=object)
+        self._values = {column: self._column(column, capacity) for column in self.COLUMNS}
+
+    def update(self, store):
+        """Apply the messages appended to a `MessageStore` since the last call."""
+        messages, self.cursor = store.since(self.cursor)
+        for message in messages:
+            self.on_message(message)
+
+    def on_message(self, msg):
+        msg_type = msg.get('type')
+        if msg_type == 'received':
+            order = self._order(msg['order_id'], msg)
+            order['order_type'] = msg.get('order_type')
+            order['status'] = 'received'
+            order['size'] = _float(msg.get('size'))
+            order['price'] = _float(msg.get('price'))
+            order['funds'] = _float(msg.get('funds'))
+            order['remaining_size'] = order['size']
+            order['time'] = msg.get('time')
+        elif msg_type == 'activate':
+            order = self._order(msg['order_id'], msg)
+            order['order_type'] = msg.get('stop_type')
+            order['status'] = 'pending'
+            order['size'] = _float(msg.get('size'))
+            order['funds'] = _float(msg.get('funds'))
+            order['stop_price'] = _float(msg.get('stop_price'))
+            order['price'] = order['stop_price']
+            order['remaining_size'] = order['size']
+            order['time'] = msg.get('time')
+        elif msg_type == 'open':
+            order = self._order(msg['order_id'], msg)
+            order['status'] = 'open'
+            order['remaining_size'] = _float(msg.get('remaining_size'))
+            if msg.get('price') is not None:
+                order['price'] = _float(msg['price'])
+        elif msg_type == 'match':
+            size = float(msg['size'])
+            price = float(msg['price'])
+            for key in ('maker_order_id', 'taker_order_id'):
+                order_id = msg.get(key)
+                if order_id in self.orders:
+                    order = self._order(order_id, msg)
+                    order['filled_size'] += size
+                    order['executed_value'] += size * price
+                    if order['remaining_size'] is not None:
+                        order['remaining_size'] = max(order['remaining_size'] - size, 0.0)
+        elif msg_type == 'done':
+            order = self._order(msg['order_id'], msg)
+            order['status'] = msg.get('reason')
+            order['reason'] = msg.get('reason')
+            order['done_at'] = msg.get('time')
+            if msg.get('remaining_size') is not None:
+                order['remaining_size'] = _float(msg['remaining_size'])
+        elif msg_type == 'change':
+            order = self._order(msg['order_id'], msg)
+            if msg.get('new_size') is not None:
+                order['size'] = _float(msg['new_size'])
+                order['remaining_size'] = order['size'] - order['filled_size']
+            if msg.get('new_funds') is not None:
+                order['funds'] = _float(msg['new_funds'])
+
+    def _order(self, order_id, msg):
+        order = self.orders.get(order_id)
+        if order is None:
+            order = dict.fromkeys(self.COLUMNS)
+            order.update(order_id=order_id, product_id=msg.get('product_id'), side=msg.get('side'),
+                         filled_size=0.0, executed_value=0.0)
+            self.orders[order_id] = order
+            for currency in (msg.get('product_id') or '').split('-'):
+                if currency and currency not in self._currencies:
+                    self._currencies.append(currency)
+        self._dirty.add(order_id)
+        return order
+
+    def _row(self, order):
+        row = dict(order)
+        base, quote = order['product_id'].split('-')
+        sign = 1 if order['side'] == 'buy' else -1
+        row[base] = sign * order['filled_size']
+        row[quote] = -sign * order['executed_value']
+        if order['status'] in ('filled', 'canceled'):
+            row['currency_on_hold'], row['on_hold'] = None, 0.0
+        elif order['side'] == 'buy':
+            remaining = order['remaining_size'] or 0.0
+            row['currency_on_hold'] = quote
+            row['on_hold'] = remaining * order['price'] if order['price'] else (order['funds'] or 0.0)
+        else:
+            row['currency_on_hold'], row['on_hold'] = base, order['remaining_size'] or 0.0
+        return row
+
+    def _column(self, column, capacity):
+        if column in self.FLOATS:
+            return np.full(capacity, np.nan)
+        if column in self._currencies:
+            return np.zeros(capacity)
+        return np.full(capacity, None, dtype=object)
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        while capacity < needed:
+            capacity *= 2
+        for column, values in self._values.items():
+            grown = self._column(column, capacity)
+            grown[:len(values)] = values
+            self._values[column] = grown
+        ids = np.empty(capacity, dtype=object)
+        ids[:len(self._ids)] = self._ids
+        self._ids = ids
+
+    def dataframe(self):
+        """One row per order. Cached; only orders changed since the last call are rebuilt."""
+        if not self._dirty:
+            return self._frame
+        new = [order_id for order_id in self._dirty if order_id not in self._rows]
+        if len(self._rows) + len(new) > len(self._ids):
+            self._grow(len(self._rows) + len(new))
+        for order_id in new:
+            self._ids[len(self._rows)] = order_id
+            self._rows[order_id] = len(self._rows)
+        for currency in self._currencies:
+            if currency not in self._values:
+                self._values[currency] = self._column(currency, len(self._ids))
+        for order_id in self._dirty:
+            position = self._rows[order_id]
+            row = self._row(self.orders[order_id])
+            for column, values in self._values.items():
+                value = row.get(column, 0.0)
+                values[position] = np.nan if value is None and values.dtype != object else value
+        count = len(self._rows)
+        index = pd.Index(self._ids[:count], dtype=object, copy=False)
+        self._frame = pd.DataFrame({column: pd.Series(values[:count], index=index, dtype=values.dtype, copy=False)
+                                    for column, values in self._values.items()}, copy=False)
+        self._dirty = set()
+        return self._frame
+
+    def __len__(self):
+        return len(self.orders)
+
+
+def _float(value):
+    return None if value is None else float(value)
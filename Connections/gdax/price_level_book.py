@@ -0,0 +1,293 @@
+#
+# gdax/price_level_book.py
+#
+# Level 3 order book engine: sorted price levels held in compact arrays,
+# integer tick prices and an order id index for O(1) cancels and changes
+
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+
+# One aggregated price level of a depth snapshot
+LEVEL_DTYPE = np.dtype([('price', 'f8'), ('size', 'f8'), ('orders', 'i8')])
+
+# Read-only top of book published by `OrderBook` after every message.
+# `bids` and `asks` are `LEVEL_DTYPE` arrays ordered from the best level outward.
+BookSnapshot = namedtuple('BookSnapshot', ['sequence', 'bids', 'asks'])
+
+
+def to_ticks(value, decimals):
+    """Convert a price or size to an integer number of ticks.
+
+    Strings are split on the decimal point instead of going through
+    `Decimal` or `float`, which keeps the conversion exact and cheap.
+    Digits beyond `decimals` are truncated.
+
+    Args:
+        value (str, int, float or Decimal): Price or size.
+        decimals (int): Number of decimal places in one tick.
+
+    Returns:
+        int: `value` expressed in ticks.
+
+    """
+    if isinstance(value, str):
+        whole, _, frac = value.partition('.')
+        return int(whole + frac[:decimals].ljust(decimals, '0'))
+    return int(round(value * 10 ** decimals))
+
+
+def from_ticks(ticks, decimals):
+    """Convert an integer number of ticks back to a `Decimal`."""
+    return Decimal(ticks).scaleb(-decimals)
+
+
+class _Level(object):
+    """ FIFO queue of the orders resting at one price.
+
+    Orders are appended to `ids`/`sizes` and keep their slot until the level
+    is compacted, so a removal only tombstones its slot.
+    """
+    __slots__ = ('ids', 'sizes', 'head', 'count', 'total')
+
+    def __init__(self):
+        self.ids = []
+        self.sizes = array('q')
+        self.head = 0
+        self.count = 0
+        self.total = 0
+
+
+class PriceLevelBook(object):
+    """Full (level 3) order book for a single product.
+
+    Each side keeps an ascending `array` of the price levels it holds and a
+    dict of price -> `_Level`. Every resting order is indexed by id as
+    `(side, price, slot)` so `remove`, `match` and `change` never scan a
+    level. Prices and sizes are stored as integer ticks.
+
+    Orders are feed/REST dicts or typed `decoder.Message` structs, whose fields
+    are read as attributes, with prices and sizes already parsed.
+
+    Args:
+        price_decimals (Optional[int]): Decimal places kept for prices.
+        size_decimals (Optional[int]): Decimal places kept for sizes.
+
+    """
+
+    # Tombstoned slots tolerated in a level before it is compacted
+    COMPACT_THRESHOLD = 32
+
+    def __init__(self, price_decimals=8, size_decimals=8):
+        self.price_decimals = price_decimals
+        self.size_decimals = size_decimals
+        self.clear()
+
+    def clear(self):
+        self._prices = {'buy': array('q'), 'sell': array('q')}
+        self._levels = {'buy': {}, 'sell': {}}
+        self._index = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, order_id):
+        return order_id in self._index
+
+    def add(self, order):
+        if isinstance(order, dict):
+            order_id = order.get('order_id') or order['id']
+            side = order['side']
+            price = to_ticks(order['price'], self.price_decimals)
+            size = to_ticks(order.get('size') or order['remaining_size'], self.size_decimals)
+        else:
+            order_id, side = order.order_id, order.side
+            price = to_ticks(order.price, self.price_decimals)
+            size = to_ticks(order.remaining_size, self.size_decimals)
+        if order_id in self._index:
+            self._discard(order_id)
+
+        levels = self._levels[side]
+        level = levels.get(price)
+        if level is None:
+            level = levels[price] = _Level()
+            prices = self._prices[side]
+            prices.insert(bisect_left(prices, price), price)
+
+        self._index[order_id] = (side, price, len(level.ids))
+        level.ids.append(order_id)
+        level.sizes.append(size)
+        level.count += 1
+        level.total += size
+        return side, price
+
+    def remove(self, order):
+        return self._discard(order['order_id'] if isinstance(order, dict) else order.order_id)
+
+    def match(self, order):
+        if isinstance(order, dict):
+            maker_order_id, size = order['maker_order_id'], order['size']
+        else:
+            maker_order_id, size = order.maker_order_id, order.size
+        entry = self._index.get(maker_order_id)
+        if entry is None:
+            return None
+        side, price, slot = entry
+        size = to_ticks(size, self.size_decimals)
+        level = self._levels[side][price]
+        if level.sizes[slot] <= size:
+            self._discard(maker_order_id)
+        else:
+            level.sizes[slot] -= size
+            level.total -= size
+        return side, price
+
+    def change(self, order):
+        if isinstance(order, dict):
+            order_id, new_size = order['order_id'], order.get('new_size')
+        else:
+            order_id, new_size = order.order_id, order.new_size
+        if new_size is None:
+            return None
+        new_size = to_ticks(new_size, self.size_decimals)
+        entry = self._index.get(order_id)
+        if entry is None:
+            return None
+        side, price, slot = entry
+        level = self._levels[side][price]
+        level.total += new_size - level.sizes[slot]
+        level.sizes[slot] = new_size
+        return side, price
+
+    def _discard(self, order_id):
+        entry = self._index.pop(order_id, None)
+        if entry is None:
+            return None
+        side, price, slot = entry
+        level = self._levels[side][price]
+        level.total -= level.sizes[slot]
+        level.sizes[slot] = 0
+        level.ids[slot] = None
+        level.count -= 1
+
+        if level.count == 0:
+            del self._levels[side][price]
+            prices = self._prices[side]
+            del prices[bisect_left(prices, price)]
+        elif slot == level.head:
+            ids = level.ids
+            head = slot + 1
+            while ids[head] is None:
+                head += 1
+            level.head = head
+            if head > self.COMPACT_THRESHOLD and head > level.count:
+                self._compact(side, price, level)
+        elif len(level.ids) - level.count > max(self.COMPACT_THRESHOLD, level.count):
+            self._compact(side, price, level)
+        return side, price
+
+    def _compact(self, side, price, level):
+        ids = []
+        sizes = array('q')
+        index = self._index
+        for order_id, size in zip(level.ids, level.sizes):
+            if order_id is not None:
+                index[order_id] = (side, price, len(ids))
+                ids.append(order_id)
+                sizes.append(size)
+        level.ids = ids
+        level.sizes = sizes
+        level.head = 0
+
+    def best(self, side):
+        """Best price on `side` in ticks, or None if the side is empty."""
+        prices = self._prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == 'buy' else prices[0]
+
+    def levels(self, side, depth=None):
+        """Yield `(price, size, order count)` in ticks from the best level outward."""
+        prices = self._prices[side]
+        if side == 'buy':
+            stop = -1 if depth is None else max(len(prices) - depth - 1, -1)
+            positions = range(len(prices) - 1, stop, -1)
+        else:
+            positions = range(len(prices) if depth is None else min(depth, len(prices)))
+        levels = self._levels[side]
+        for i in positions:
+            level = levels[prices[i]]
+            yield prices[i], level.total, level.count
+
+    def in_top(self, side, price, depth):
+        """True if `price` ticks is at or better than the `depth`-th best level of `side`."""
+        prices = self._prices[side]
+        if len(prices) < depth:
+            return True
+        if side == 'buy':
+            return price >= prices[-depth]
+        return price <= prices[depth - 1]
+
+    def top(self, side, depth):
+        """Aggregated `depth` best levels of `side` as a read-only `LEVEL_DTYPE` array."""
+        levels = np.array(list(self.levels(side, depth)), dtype=LEVEL_DTYPE)
+        levels['price'] /= 10 ** self.price_decimals
+        levels['size'] /= 10 ** self.size_decimals
+        levels.flags.writeable = False
+        return levels
+
+    def level_orders(self, side, price):
+        """List of `(order_id, size)` resting at `price` ticks in queue order."""
+        level = self._levels[side].get(price)
+        if level is None:
+            return None
+        return [(order_id, size)
+                for order_id, size in zip(level.ids[level.head:], level.sizes[level.head:])
+                if order_id is not None]
+
+    def orders(self, side):
+        """Yield `(price, order_id, size)` in ticks for every order on `side`, lowest price first.
+
+        Safe to call while another thread updates the book: it walks a copy of
+        the price list and skips levels removed meanwhile, so it never raises,
+        but the result may mix states from before and after an update.
+        """
+        levels = self._levels[side]
+        for price in self._prices[side][:]:
+            level = levels.get(price)
+            if level is None:
+                continue
+            head = level.head
+            for order_id, size in zip(level.ids[head:], level.sizes[head:]):
+                if order_id is not None:
+                    yield price, order_id, size
+
+    def get_bid(self):
+        price = self.best('buy')
+        return None if price is None else from_ticks(price, self.price_decimals)
+
+    def get_ask(self):
+        price = self.best('sell')
+        return None if price is None else from_ticks(price, self.price_decimals)
+
+    def get_bids(self, price):
+        return self._get_orders('buy', price)
+
+    def get_asks(self, price):
+        return self._get_orders('sell', price)
+
+    def _get_orders(self, side, price):
+        if price is None:
+            return None
+        orders = self.level_orders(side, to_ticks(price, self.price_decimals))
+        if orders is None:
+            return None
+        price = from_ticks(to_ticks(price, self.price_decimals), self.price_decimals)
+        return [{'id': order_id,
+                 'side': side,
+                 'price': price,
+                 'size': from_ticks(size, self.size_decimals)} for order_id, size in orders]
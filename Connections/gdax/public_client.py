@@ -4,7 +4,8 @@
 #
 # For public requests to the GDAX exchange
 
-import requests
+from Connections.gdax.http_session import shared_session
+from Connections.gdax.scheduler import shared_scheduler, MARKET_DATA
 
 
 class PublicClient(object):
@@ -15,23 +16,52 @@ class PublicClient(object):
 
     Attributes:
         url (Optional[str]): API URL. Defaults to GDAX API.
+        session (requests.Session): Keep-alive session used for requests.
+        scheduler (RequestScheduler): Rate limits and prioritizes requests.
 
     """
 
-    def __init__(self, api_url='https://api.gdax.com', timeout=30):
+    def __init__(self, api_url='https://api.gdax.com', timeout=30, session=None, scheduler=None):
         """Create GDAX API public client.
 
         Args:
             api_url (Optional[str]): API URL. Defaults to GDAX API.
+            session (Optional[requests.Session]): Session to send requests
+                with, see `http_session.create_session`. Defaults to a
+                pooled session shared by all clients.
+            scheduler (Optional[RequestScheduler]): Scheduler all requests
+                go through. Defaults to the one shared by all clients, so
+                they respect the exchange rate limits together.
 
         """
         self.url = api_url.rstrip('/')
         self.timeout = timeout
+        self.session = session if session else shared_session()
+        self.scheduler = scheduler if scheduler else shared_scheduler()
+
+    def _request(self, method, url, priority=MARKET_DATA, **kwargs):
+        """Send a request through the scheduler and return the response.
+
+        Requests carrying `auth` use the private rate limit. Identical GETs
+        in flight at the same time are sent once; signed GETs are only shared
+        between callers using the same API key, and not at all when the auth
+        has no `api_key` to tell accounts apart.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        key = None
+        if method == 'GET':
+            params = kwargs.get('params') or {}
+            key = (url, repr(sorted(params.items())))
+            if 'auth' in kwargs:
+                api_key = getattr(kwargs['auth'], 'api_key', None)
+                key = key + (api_key,) if api_key is not None else None
+        return self.scheduler.submit(lambda: self.session.request(method, url, **kwargs),
+                                     private='auth' in kwargs, priority=priority, key=key)
 
     def _get(self, path, params=None):
         """Perform get request"""
 
-        r = requests.get(self.url + path, params=params, timeout=self.timeout)
+        r = self._request('GET', self.url + path, params=params)
         r.raise_for_status()
         return r.json()
 
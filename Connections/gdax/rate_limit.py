@@ -0,0 +1,78 @@
+#
+# gdax/rate_limit.py
+#
+# Token bucket rate limiter usable from threads and from asyncio
+
+import asyncio
+import threading
+import time
+
+
+# Published GDAX REST limits, in requests per second with the allowed burst
+PUBLIC_RATE, PUBLIC_BURST = 3, 6
+PRIVATE_RATE, PRIVATE_BURST = 5, 10
+
+
+class TokenBucket(object):
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`.
+
+    Tokens are reserved up front, so callers queue fairly in call order and
+    never need to retry: `reserve` takes the tokens (letting the balance go
+    negative) and returns how long the caller has to wait before using them.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (Optional[float]): Bucket size. Defaults to `rate`.
+
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """Take `tokens` and return the seconds to wait before they are valid."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def try_acquire(self, tokens=1):
+        """Take `tokens` only if they are available now.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until
+                they would be (nothing is reserved).
+
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def available(self):
+        """Tokens that could be used right now without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self._tokens)
+
+    def acquire(self, tokens=1):
+        """Block the calling thread until `tokens` are available."""
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """Coroutine version of `acquire`."""
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
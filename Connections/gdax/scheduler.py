@@ -0,0 +1,125 @@
+#
+# gdax/scheduler.py
+#
+# Central scheduler for REST calls: rate limits, priorities and GET coalescing
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from Connections.gdax.rate_limit import TokenBucket, PUBLIC_RATE, PUBLIC_BURST, PRIVATE_RATE, PRIVATE_BURST
+
+
+# Priority classes, most urgent first
+ORDER, ACCOUNT, MARKET_DATA = range(3)
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class RequestScheduler(object):
+    """Admits REST calls under the exchange rate limits, most urgent first.
+
+    Public and private (signed) calls draw from separate token buckets. While a
+    bucket is empty, waiting calls are admitted by priority class and then in
+    arrival order, so order placement and cancels jump ahead of account reads,
+    which jump ahead of market data polling. Calls run on the caller's thread.
+
+    Identical GETs that are already in flight are not sent again: later callers
+    wait for the first one and get the same response.
+
+    Args:
+        public_bucket, private_bucket (Optional[TokenBucket]): Rate limiters.
+            Default to the published GDAX limits.
+
+    """
+
+    def __init__(self, public_bucket=None, private_bucket=None):
+        self.buckets = {
+            False: public_bucket if public_bucket else TokenBucket(PUBLIC_RATE, PUBLIC_BURST),
+            True: private_bucket if private_bucket else TokenBucket(PRIVATE_RATE, PRIVATE_BURST),
+        }
+        self._waiting = {False: [], True: []}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.metrics = {'requests': 0, 'coalesced': 0, 'throttled': 0}
+
+    def submit(self, fn, private=False, priority=MARKET_DATA, key=None):
+        """Run `fn()` once admitted and return its result.
+
+        Args:
+            fn (callable): Sends the request.
+            private (bool): Whether the call is signed (private rate limit).
+            priority (int): `ORDER`, `ACCOUNT` or `MARKET_DATA`.
+            key (Optional[hashable]): Identity of an idempotent request; calls
+                with the same key made while one is in flight share its result.
+
+        """
+        if key is None:
+            self._admit(private, priority)
+            return fn()
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.metrics['coalesced'] += 1
+        if not owner:
+            return future.result()
+        try:
+            self._admit(private, priority)
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _admit(self, private, priority):
+        """Block until this call is the most urgent one waiting and a token is free."""
+        waiting = self._waiting[private]
+        bucket = self.buckets[private]
+        with self._cond:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(waiting, ticket)
+            throttled = False
+            while True:
+                if waiting[0] == ticket:
+                    wait = bucket.try_acquire()
+                    if not wait:
+                        heapq.heappop(waiting)
+                        self._cond.notify_all()
+                        break
+                    throttled = True
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            self.metrics['requests'] += 1
+            if throttled:
+                self.metrics['throttled'] += 1
+
+    def pending(self):
+        """Number of calls waiting for admission, per priority class."""
+        with self._cond:
+            counts = dict.fromkeys((ORDER, ACCOUNT, MARKET_DATA), 0)
+            for priority, _ in self._waiting[False] + self._waiting[True]:
+                counts[priority] += 1
+            return counts
+
+
+def shared_scheduler():
+    """Process wide scheduler used by clients created without an explicit one."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = RequestScheduler()
+    return _shared
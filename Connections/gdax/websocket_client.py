@@ -7,9 +7,6 @@
 
 from __future__ import print_function
 import json
-import base64
-import hmac
-import hashlib
 import time
 import socket
 import errno
@@ -18,12 +15,34 @@ from threading import Thread
 import websocket
 from websocket import create_connection, WebSocketConnectionClosedException
 from pymongo import MongoClient 
-from Connections.gdax.gdax_auth import get_auth_headers
+from Connections.gdax.gdax_auth import get_signer
+from Connections.gdax.decoder import Decoder
+from Connections.gdax.frame_queue import FrameQueue, QueueOverflow
+from Connections.gdax.mongo_writer import MongoWriter
+from Connections.gdax.message_store import MessageStore
 from signal import signal, SIGPIPE, SIG_DFL
 
+def subscribe_params(products, channels=None, key=None, b64secret=None, passphrase=None):
+    """ Subscribe message for `products` and `channels`, signed when `b64secret` is given. """
+    if channels is None:
+        params = {'type': 'subscribe', 'product_ids': products}
+    else:
+        params = {'type': 'subscribe', 'product_ids': products, 'channels': channels}
+
+    if b64secret:
+        timestamp = str(time.time())
+        message = timestamp + 'GET' + '/users/self/verify'
+        params['signature'] = get_signer(b64secret).sign(message)
+        params['key']       = key
+        params['passphrase']= passphrase
+        params['timestamp'] = timestamp
+    return params
+
+
 class WebsocketClient(object):
     def __init__(self, url="wss://ws-feed.gdax.com", products=None, message_type="subscribe", channels=None, should_print=False, auth=False, key=None, 
-            b64secret=None, passphrase=None, mongo_collection=None, persist=False):
+            b64secret=None, passphrase=None, mongo_collection=None, persist=False, decoder=None,
+            dispatch_threads=0, queue_size=10000, overflow='block', persist_maxlen=100000, persist_max_age=None):
         signal(SIGPIPE,SIG_DFL) # this ignores the errno 32, broken pipe
         self.url = url
         self.products = products
@@ -39,13 +58,20 @@ class WebsocketClient(object):
         self.api_passphrase = passphrase
         self.should_print = should_print
         self.mongo_collection = mongo_collection
+        self.mongo_writer = MongoWriter(mongo_collection) if mongo_collection else None
         self.persist = persist
+        self.decoder = decoder if decoder else Decoder()
+        # With dispatch_threads the receive thread only enqueues frames and the
+        # dispatcher threads decode them and call on_message. Use more than one
+        # dispatcher only when on_message does not depend on message order.
+        self.dispatch_threads = dispatch_threads
+        self.queue = FrameQueue(queue_size, overflow) if dispatch_threads else None
         self.sub_params = None
         self.previouslyConnected = False
         self.msgPrintDueToError = False
         self.msgCount = 0
         if self.persist:
-            self.data = []
+            self.data = MessageStore(maxlen=persist_maxlen, max_age=persist_max_age)
         else:
             self.data = None
 
@@ -75,22 +101,10 @@ class WebsocketClient(object):
         if self.url[-1] == "/":
             self.url = self.url[:-1]
 
-        if self.channels is None:
-            self.sub_params = {'type': 'subscribe', 'product_ids': self.products}
-        else:
-            self.sub_params = {'type': 'subscribe', 'product_ids': self.products, 'channels': self.channels}
-
         if self.auth:
-            timestamp = str(time.time())
-            message = timestamp + 'GET' + '/users/self/verify'
-            message = message.encode('ascii')
-            hmac_key = base64.b64decode(self.api_secret)
-            signature = hmac.new(hmac_key, message, hashlib.sha256)
-            signature_b64 = base64.b64encode(signature.digest()).decode('utf-8').rstrip('\n')
-            self.sub_params['signature'] = signature_b64
-            self.sub_params['key']       = self.api_key
-            self.sub_params['passphrase']= self.api_passphrase
-            self.sub_params['timestamp'] = timestamp
+            self.sub_params = subscribe_params(self.products, self.channels, self.api_key, self.api_secret, self.api_passphrase)
+        else:
+            self.sub_params = subscribe_params(self.products, self.channels)
 
     def _connect(self):
         try:
@@ -138,14 +152,39 @@ class WebsocketClient(object):
                 raise Exception(e)
 
 
+    def _dispatch(self):
+        # Runs until close(), or until _listen gave up and closed the queue and it has been drained
+        while not (self.stop or (self.queue.closed and not len(self.queue))):
+            data = self.queue.get(timeout=1)
+            if data is None:
+                continue
+            try:
+                msg = self.decoder.decode(data)
+                self.on_message(msg)
+            except Exception as e:
+                self.on_error(e, data)
+
     def _listen(self):
         keepalive = Thread(target=self.keepalive)
         keepalive.start()
+        dispatchers = [Thread(target=self._dispatch) for _ in range(self.dispatch_threads)]
+        for dispatcher in dispatchers:
+            dispatcher.start()
         while not self.stop:
             try:
                 data = self.ws.recv()
                 if data:
-                    msg = json.loads(data)
+                    if self.queue is not None:
+                        self.queue.put(data)
+                        continue
+                    msg = self.decoder.decode(data)
+            except QueueOverflow as e:
+                # Dispatchers fell too far behind: drop the backlog and resubscribe
+                self.on_error(e)
+                self.queue.clear()
+                self.terminatingWs()
+                self._connect()
+                continue
             except IOError as e:
                 print("Error at IO")
                 if e.errno == errno.EPIPE:
@@ -173,6 +212,10 @@ class WebsocketClient(object):
                 break
             else:
                 self.on_message(msg)
+        if self.queue is not None:
+            self.queue.close()
+        for dispatcher in dispatchers:
+            dispatcher.join()
         keepalive.join()
 
     def _disconnect(self):
@@ -197,6 +240,8 @@ class WebsocketClient(object):
             self.stop = True
             self.terminatingWs()
             self.thread.join()
+            if self.mongo_writer:
+                self.mongo_writer.close()
         except Exception as e:
             print("Error occured while attempting to close the connection: \n     {}".format(e))
 
@@ -221,8 +266,8 @@ class WebsocketClient(object):
                 self.msgPrintDueToError = False
                 self.msgCount = 0
             print(msg)
-        if self.mongo_collection:  # dump JSON to given mongo collection
-            self.mongo_collection.insert_one(self.data)
+        if self.mongo_writer:  # dump JSON to given mongo collection, batched on the writer thread
+            self.mongo_writer.put(dict(msg))
 
     def on_error(self, e, data=None):
         if not self.stop:
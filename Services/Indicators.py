@@ -0,0 +1,296 @@
+import math
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Incremental technical indicators. Every indicator keeps the state of the
+# closed candles and derives the forming (last) candle from it, so appending
+# a candle or updating the forming one costs O(1), and the values match
+# stockstats' full recomputation.
+
+COLUMNS = ['time', 'low', 'high', 'open', 'close', 'volume']
+TIME, LOW, HIGH, OPEN, CLOSE, VOLUME = range(6)
+
+
+class _Ewm():
+    """`Series.ewm(alpha=alpha, adjust=True).mean()`, one value at a time."""
+    def __init__(self, alpha):
+        self.decay  = 1.0 - alpha
+        self.mean   = None
+        self.weight = 1.0
+        self._next  = None
+
+    def peek(self, x):
+        if self.mean is None:
+            self._next = (x, 1.0)
+        else:
+            weight = self.weight * self.decay
+            mean   = self.mean if self.mean == x else (weight * self.mean + x) / (weight + 1.0)
+            self._next = (mean, weight + 1.0)
+        return self._next[0]
+
+    def commit(self):
+        self.mean, self.weight = self._next
+
+
+class _Window():
+    """Sum, min and max of the last `size` values (`min_periods=1`), the newest one still forming."""
+    def __init__(self, size, extremes=False):
+        self.size    = size
+        self.closed  = deque()
+        self.total   = 0.0
+        self.count   = 0
+        self.extremes= extremes
+        self.mins    = deque()
+        self.maxs    = deque()
+        self._x      = None
+
+    def peek(self, x):
+        self._x = x
+        return self.total + x, len(self.closed) + 1
+
+    def peek_min(self, x):
+        return x if not self.mins or x < self.mins[0][1] else self.mins[0][1]
+
+    def peek_max(self, x):
+        return x if not self.maxs or x > self.maxs[0][1] else self.maxs[0][1]
+
+    def commit(self):
+        x = self._x
+        self.closed.append(x)
+        self.total += x
+        if len(self.closed) > self.size - 1:
+            self.total -= self.closed.popleft()
+        if self.extremes:
+            self.count += 1
+            oldest = self.count - (self.size - 1)
+            for extremes, worse in ((self.mins, lambda a, b: a >= b), (self.maxs, lambda a, b: a <= b)):
+                while extremes and worse(extremes[-1][1], x):
+                    extremes.pop()
+                extremes.append((self.count, x))
+                while extremes and extremes[0][0] < oldest + 1:
+                    extremes.popleft()
+
+
+class _RSI():
+    def __init__(self, name, window):
+        self.columns = [name]
+        self.up      = _Ewm(1.0 / window)
+        self.down    = _Ewm(1.0 / window)
+        self.last    = None
+
+    def peek(self, row):
+        diff = 0.0 if self.last is None else row[CLOSE] - self.last
+        self._close = row[CLOSE]
+        up   = self.up.peek(diff if diff > 0 else 0.0)
+        down = self.down.peek(-diff if diff < 0 else 0.0)
+        if self.last is None or up + down == 0:
+            return (50.0,)
+        return (100 * (up / (up + down)),)
+
+    def commit(self):
+        self.up.commit()
+        self.down.commit()
+        self.last = self._close
+
+
+class _MACD():
+    def __init__(self, name, short=12, long=26, signal=9):
+        self.columns = [name, name + 's', name + 'h']
+        self.short   = _Ewm(2.0 / (short + 1))
+        self.long    = _Ewm(2.0 / (long + 1))
+        self.signal  = _Ewm(2.0 / (signal + 1))
+
+    def peek(self, row):
+        macd  = self.short.peek(row[CLOSE]) - self.long.peek(row[CLOSE])
+        macds = self.signal.peek(macd)
+        return macd, macds, macd - macds
+
+    def commit(self):
+        self.short.commit()
+        self.long.commit()
+        self.signal.commit()
+
+
+class _RSV():
+    def __init__(self, name, window):
+        self.columns = [name]
+        self.lows    = _Window(window, extremes=True)
+        self.highs   = _Window(window, extremes=True)
+
+    def peek(self, row):
+        self.lows.peek(row[LOW])
+        self.highs.peek(row[HIGH])
+        low  = self.lows.peek_min(row[LOW])
+        high = self.highs.peek_max(row[HIGH])
+        if high == low:
+            return (0.0,)
+        value = (row[CLOSE] - low) / (high - low) * 100
+        return (0.0 if math.isnan(value) or math.isinf(value) else value,)
+
+    def commit(self):
+        self.lows.commit()
+        self.highs.commit()
+
+
+class _SMA():
+    def __init__(self, name, column, window):
+        self.columns = [name]
+        self.column  = column
+        self.window  = _Window(window)
+
+    def peek(self, row):
+        total, count = self.window.peek(row[self.column])
+        return (total / count,)
+
+    def commit(self):
+        self.window.commit()
+
+
+class _EMA():
+    def __init__(self, name, column, window):
+        self.columns = [name]
+        self.column  = column
+        self.ewm     = _Ewm(2.0 / (window + 1))
+
+    def peek(self, row):
+        return (self.ewm.peek(row[self.column]),)
+
+    def commit(self):
+        self.ewm.commit()
+
+
+class _VWAP():
+    """Cumulative volume weighted price of the lows, as `Forecast.indicators` defines `vwap`."""
+    def __init__(self, name):
+        self.columns = [name]
+        self.value   = 0.0
+        self.volume  = 0.0
+
+    def peek(self, row):
+        self._next = (self.value + row[VOLUME] * row[LOW], self.volume + row[VOLUME])
+        return (self._next[0] / self._next[1] if self._next[1] else np.nan,)
+
+    def commit(self):
+        self.value, self.volume = self._next
+
+
+def _indicator(name):
+    match = re.match(r'^rsi(?:_(\d+))?$', name)
+    if match:
+        return _RSI(name, int(match.group(1) or 14))
+    match = re.match(r'^macd$', name)
+    if match:
+        return _MACD(name)
+    match = re.match(r'^rsv(?:_(\d+))?$', name)
+    if match:
+        return _RSV(name, int(match.group(1) or 9))
+    match = re.match(r'^(low|high|open|close|volume)_(\d+)_(sma|ema)$', name)
+    if match:
+        column, window = COLUMNS.index(match.group(1)), int(match.group(2))
+        return (_SMA if match.group(3) == 'sma' else _EMA)(name, column, window)
+    if name == 'vwap':
+        return _VWAP(name)
+    raise ValueError('Unsupported indicator {}'.format(name))
+
+
+class IndicatorEngine():
+    """Keeps OHLCV candles and their indicators up to date one candle at a time.
+
+    `indicators` uses stockstats names: `rsi_N`, `macd` (adds `macds` and
+    `macdh`), `rsv_N`, `<column>_N_sma`, `<column>_N_ema` and `vwap`.
+
+    `update` with the time of the last candle replaces that (forming) candle,
+    a later time closes it and appends a new one; each costs O(1) per
+    indicator. Values are kept in preallocated NumPy arrays (`array`), and
+    `dataframe()` builds a frame only when something changed.
+
+    With `max_rows` the arrays stop growing at that many candles and the
+    oldest half is dropped when they are full; the indicators carry their
+    own state, so their values are not affected.
+    """
+    def __init__(self, indicators=('rsi_14', 'macd', 'rsv_14'), capacity=1024, max_rows=None):
+        self.indicators = [_indicator(name) for name in indicators]
+        self.columns    = COLUMNS + [column for indicator in self.indicators for column in indicator.columns]
+        self._index     = {column: i for i, column in enumerate(self.columns)}
+        self.max_rows   = max_rows
+        self._data      = np.empty((min(capacity, max_rows) if max_rows else capacity, len(self.columns)))
+        self.count      = 0
+        self.version    = 0
+        self._frame     = None
+        self._frame_version = -1
+
+    def __len__(self):
+        return self.count
+
+    def last_time(self):
+        return self._data[self.count - 1, TIME] if self.count else None
+
+    def update(self, time, low, high, open, close, volume):
+        last = self.last_time()
+        if last is not None and time < last:
+            return
+        if time == last and tuple(self._data[self.count - 1, :len(COLUMNS)]) == (time, low, high, open, close, volume):
+            return
+        if last is None or time > last:
+            if last is not None:
+                for indicator in self.indicators:
+                    indicator.commit()
+            if self.count == len(self._data):
+                if self.max_rows and self.count >= self.max_rows:
+                    keep = self.count // 2
+                    self._data[:keep] = self._data[self.count - keep:self.count]
+                    self.count = keep
+                else:
+                    size = len(self._data) * 2
+                    data = np.empty((min(size, self.max_rows) if self.max_rows else size, len(self.columns)))
+                    data[:self.count] = self._data[:self.count]
+                    self._data = data
+            self.count += 1
+        row = self._data[self.count - 1]
+        row[:len(COLUMNS)] = (time, low, high, open, close, volume)
+        column = len(COLUMNS)
+        for indicator in self.indicators:
+            values = indicator.peek(row)
+            row[column:column + len(values)] = values
+            column += len(values)
+        self.version += 1
+
+    def extend(self, ohlc):
+        """Apply the candles of an OHLCV frame that are not older than the forming candle."""
+        times = ohlc['time'].values
+        last  = self.last_time()
+        rows  = ohlc[COLUMNS].values[times >= last] if last is not None else ohlc[COLUMNS].values
+        if len(rows) > 1 and (np.diff(rows[:, TIME]) < 0).any():
+            rows = rows[np.argsort(rows[:, TIME], kind='stable')]
+        for row in rows:
+            self.update(*row)
+
+    def array(self, name):
+        """Read-only view of a column (candle field or indicator), oldest first."""
+        view = self._data[:self.count, self._index[name]]
+        view.flags.writeable = False
+        return view
+
+    def last(self, name):
+        return self._data[self.count - 1, self._index[name]] if self.count else None
+
+    def rows(self, times):
+        """Values of the candles at `times`, one row per time; NaN for times the engine does not hold."""
+        times = np.asarray(times, dtype=float)
+        rows  = np.full((len(times), len(self.columns)), np.nan)
+        if self.count:
+            held     = self._data[:self.count, TIME]
+            position = np.minimum(np.searchsorted(held, times), self.count - 1)
+            found    = held[position] == times
+            rows[found] = self._data[position[found]]
+        return rows
+
+    def dataframe(self):
+        if self._frame_version != self.version:
+            self._frame = pd.DataFrame(self._data[:self.count].copy(), columns=self.columns)
+            self._frame_version = self.version
+        return self._frame
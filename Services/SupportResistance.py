@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+# Support and resistance levels from moving average crossovers, shared by
+# TimeSeriesAnalysis and SupportForecastingModel. Everything is computed in a
+# few vectorized passes over the close prices.
+
+
+def find_groups(ohlc, smooth, delimiter):
+    """Sections between upward crossings of the `smooth` over the `delimiter` moving average.
+
+    Adds the `smooth` and `delimiter` columns to `ohlc` (sorted by index) and returns
+    one row per crossing: its `index` label, the label of the `next` crossing, and the
+    `high`/`low` close of the section from the crossing up to and including the next
+    one (or the end), with the first labels where they occur (`h index`, `l index`).
+    """
+    ohlc['smooth']    = ohlc['close'].rolling(smooth).mean()
+    ohlc['delimiter'] = ohlc['close'].rolling(delimiter).mean()
+    crossing  = (ohlc['smooth']>=ohlc['delimiter']) & (ohlc['smooth'].shift(1)<ohlc['delimiter'].shift(1))
+    starts    = np.flatnonzero(crossing.values)
+    labels    = ohlc.index.values
+    groups    = pd.DataFrame({'index': labels[starts]})
+    groups['next'] = groups['index'].shift(-1)
+    if len(starts) == 0:
+        for column in ['high', 'low', 'h index', 'l index']:
+            groups[column] = np.nan
+        return groups
+
+    close = ohlc['close'].values.astype(float)
+    # Sections include the next crossing's candle; the last one runs to the end
+    ends  = np.append(starts[1:], len(close) - 1)
+    tail  = close[starts[0]:]
+    heads = starts - starts[0]
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(heads, len(tail))))
+    positions = np.arange(starts[0], len(close))
+    extremes = {}
+    for column, extreme in (('high', np.fmax), ('low', np.fmin)):
+        value = extreme(extreme.reduceat(tail, heads), close[ends])
+        first = np.minimum.reduceat(np.where(tail == value[group], positions, len(close)), heads)
+        first = np.where(first < len(close), first, np.where(close[ends] == value, ends, -1))
+        extremes[column] = value, np.where(first >= 0, labels[first], np.nan).astype(float)
+    groups['high']    = extremes['high'][0]
+    groups['low']     = extremes['low'][0]
+    groups['h index'] = extremes['high'][1]
+    groups['l index'] = extremes['low'][1]
+    return groups
+
+
+def support_levels(groups):
+    """Section highs and lows as one `support` series indexed by their label, with `% change`."""
+    support = pd.DataFrame(
+                  groups[['h index','high']].values.tolist() +
+                  groups[['l index','low' ]].values.tolist(),
+                  columns=['index','support']
+              ).set_index('index').sort_index()
+    support['% change'] = support['support'] / support['support'].shift(1) - 1
+    return support
+
+
+def find_tops_and_bottoms(OHLC, smooth, delimiter, window=3):
+    """Tag every candle with the `last support` at or before it and the `next support` at or after it.
+
+    Returns:
+        tuple: (ohlc with the support columns, groups, support)
+
+    """
+    ohlc = OHLC.copy()
+    ohlc.sort_index(inplace=True)
+    groups  = find_groups(ohlc, smooth=smooth, delimiter=delimiter)
+    support = support_levels(groups)
+
+    if len(support):
+        levels = support.index.values.astype(float)
+        values = support['support'].values
+        known  = ~np.isnan(levels)
+        levels, values = levels[known], values[known]
+        labels = ohlc.index.values
+        # Of several levels at one label, the last is the last support and the first the next one
+        last = np.searchsorted(levels, labels, side='right') - 1
+        nxt  = np.searchsorted(levels, labels, side='left')
+        padded = np.append(values, np.nan)
+        ohlc['last support'] = np.where(last >= 0, padded[last], np.nan)
+        ohlc['next support'] = padded[nxt]
+
+    ohlc['% from last support'] = ohlc['close'].rolling(window).mean() / ohlc['last support'] - 1
+    return ohlc, groups, support
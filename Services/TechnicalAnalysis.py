@@ -6,89 +6,188 @@ import numpy as np
 import pandas as pd 
 import time
 from stockstats import StockDataFrame
+from Services import SupportResistance
+from Services.Indicators import IndicatorEngine, COLUMNS
 pd.options.mode.chained_assignment = None
 
 
 
 class TimeSeriesAnalysis():
-    def __init__(self, ohlc, indicators):
+    """stockstats indicators of the current `OHLC` window, one row per candle, with its index.
+
+    When every indicator has an incremental version, `analyze` feeds the window
+    to an `IndicatorEngine`, which has seen every candle since the first call.
+    The values are then those of stockstats over that whole history, not over
+    the window alone: in the first rows of a window, before the moving averages
+    and the start-up terms of the EMAs have run out, they differ from what the
+    stockstats fallback computes on the window (by tens of RSI/RSV points on a
+    600 candle window). From there on both agree.
+    """
+    def __init__(self, ohlc, indicators, history=10000):
         self.OHLC = ohlc
         self.ohlc = self.OHLC
         self.ind = indicators
+        try:
+            # Keeps at least `history` candles, and twice the first window
+            self.engine = IndicatorEngine([self.ind] if isinstance(self.ind, str) else self.ind,
+                                          max_rows=max(history, 2 * len(ohlc)))
+        except ValueError:
+            # Not every stockstats indicator has an incremental version
+            self.engine = None
 
     def analyze(self):
+        if self.engine is not None:
+            # Only candles at or after the forming one are (re)computed, and only
+            # the rows of the current window are copied out of the engine
+            self.engine.extend(self.OHLC)
+            self.ohlc = self.OHLC[COLUMNS].copy()
+            self.ohlc[self.engine.columns[len(COLUMNS):]] = self.engine.rows(self.OHLC['time'].values)[:, len(COLUMNS):]
+            self.ohlc = StockDataFrame.retype(self.ohlc)
+            return self.ohlc
         self.ohlc = self.OHLC.copy()
         self.ohlc = StockDataFrame.retype( self.ohlc[['time','low','high','open','close','volume']] )
         self.ohlc[ self.ind ]
         return self.ohlc
 
     def find_groups(self, ohlc, smooth, delimiter):
-        ohlc['smooth']      = ohlc['close'].rolling(smooth).mean()
-        ohlc['delimiter']   = ohlc['close'].rolling(delimiter).mean()
-        groups              = ohlc[ (ohlc['smooth']>=ohlc['delimiter']) & (ohlc['smooth'].shift(1)<ohlc['delimiter'].shift(1)) ].reset_index()[['index']]
-        groups['next'] = groups['index'].shift(-1)
-        for i,r in groups.iterrows():
-            section  = ohlc.loc[ r['index']:r['next'] ]
-            groups.loc[i, 'high']    = section['close'].max()
-            groups.loc[i, 'low']     = section['close'].min()
-            groups.loc[i, 'h index'] = section[ section['close'] == section['close'].max() ].index.min()
-            groups.loc[i, 'l index'] = section[ section['close'] == section['close'].min() ].index.min()
-        return groups
+        return SupportResistance.find_groups(ohlc, smooth, delimiter)
 
     def find_tops_and_bottoms(self, OHLC, smooth, delimiter):
-        ohlc = OHLC.copy()
-        ohlc.sort_index(inplace=True)
-        groups  = self.find_groups(ohlc, smooth=smooth, delimiter=delimiter)
-        support = pd.DataFrame(
-                      groups[['h index','high']].values.tolist() + 
-                      groups[['l index','low' ]].values.tolist(),
-                      columns=['index','support']
-                  ).set_index('index').sort_index()
-        support['% change'] = support['support'] / support['support'].shift(1) - 1
-
-        for i,r in support.iterrows():
-            ohlc.loc[i:, 'last support'] = r['support']
-
-        for i,r in support[::-1].iterrows():
-            ohlc.loc[:i, 'next support'] = r['support']
-
-        ohlc['% from last support'] = ohlc['close'].rolling(3).mean() / ohlc['last support'] - 1
+        ohlc, groups, support = SupportResistance.find_tops_and_bottoms(OHLC, smooth, delimiter, window=3)
         return ohlc
 
 
 class Level2Analysis():
+    """Strength deciles and walls of a level 2 book, computed on NumPy arrays.
+
+    `orderbook` is a `Level2Book` or a DataFrame with `side` ('asks'/'bids'),
+    `price` and `size` columns. With a `Level2Book` the analysis is redone
+    lazily, at most once per book version; a DataFrame is analyzed when
+    `analyze()` is called. `best_entry`, `best_exit` and the next wall are
+    precomputed by `analyze`, so the queries are O(1).
+    """
+    COLUMNS = ['side', 'price', 'size', 'strength', 'wall']
+
     def __init__(self, orderbook):
-        self.BOOK = orderbook
-        self.book = None
+        self.BOOK     = orderbook
+        self._book    = None
+        self._version = None
+        self._sides   = None
+        self._flat    = None
+
+    @property
+    def book(self):
+        """The analyzed levels as a DataFrame (built on first access)."""
+        if self._flat is None:
+            return None
+        if self._book is None:
+            self._book = pd.DataFrame(self._flat, columns=self.COLUMNS, index=self._flat['index'])
+        return self._book
 
     def analyze(self):
-        self.book             = self.BOOK.copy()
-        self.book['strength'] = pd.qcut(self.book['size'].rank(method='first'), 10, labels=False)
-        self.book['wall']     = 1.5 < abs(0.6745*(self.book['size'] - self.book['size'].median())) / self.book['size'].mad()
-        
+        if isinstance(self.BOOK, pd.DataFrame):
+            index = self.BOOK.index.values
+            side  = self.BOOK['side'].values
+            price = self.BOOK['price'].values.astype(float)
+            size  = self.BOOK['size'].values.astype(float)
+        else:
+            if self._sides is not None and self._version == self.BOOK.version:
+                return
+            self._version = self.BOOK.version
+            asks, bids = self.BOOK.asks(), self.BOOK.bids()
+            index = np.arange(len(asks) + len(bids))
+            side  = np.repeat(np.array(['asks', 'bids'], dtype=object), [len(asks), len(bids)])
+            price = np.concatenate((asks[:, 0], bids[:, 0]))
+            size  = np.concatenate((asks[:, 1], bids[:, 1]))
+
+        strength = strength_deciles(size)
+        wall     = wall_flags(size)
+        self._flat  = {'index': index, 'side': side, 'price': price, 'size': size, 'strength': strength, 'wall': wall}
+        self._book  = None
+        self._sides = {}
+        for name, ascending in (('asks', True), ('bids', False)):
+            rows  = np.flatnonzero(side == name)
+            order = np.argsort(price[rows] if ascending else -price[rows], kind='stable')
+            rows  = rows[order]
+            self._sides[name] = _analyze_side(rows, price, size, strength, wall, ascending)
+
+    def _ensure(self):
+        if self._sides is None or not isinstance(self.BOOK, pd.DataFrame):
+            self.analyze()
+
     def asks(self, remove_zeros=True):
-        return self.book[ (self.book['side']=='asks') & (self.book['size'] > (0 if remove_zeros else -1)) ].sort_value('price',ascending=True )#.reset_index()#[['price','size','wall']]
+        return self._levels('asks', remove_zeros)
 
     def bids(self, remove_zeros=True):
-        return self.book[ (self.book['side']=='bids') & (self.book['size'] > (0 if remove_zeros else -1)) ].sort_value('price',ascending=False )#.reset_index()#[['price','size','wall']]
+        return self._levels('bids', remove_zeros)
+
+    def _levels(self, side, remove_zeros):
+        self._ensure()
+        rows = self._sides[side]['rows']
+        if remove_zeros:
+            rows = rows[self._flat['size'][rows] > 0]
+        return self.book.iloc[rows]
+
+    def _next_wall(self, side):
+        self._ensure()
+        walls = self._sides[side]['walls']
+        if len(walls) < 2:
+            raise IndexError('single positional indexer is out-of-bounds')
+        row = walls[1]
+        return pd.Series([self._flat[column][row] for column in self.COLUMNS], index=self.COLUMNS,
+                         name=self._flat['index'][row])
 
     def bids_next_wall(self):
-        book = self.bids()
-        return book[ book['wall'] ].iloc[1]
-    
+        return self._next_wall('bids')
+
     def asks_next_wall(self):
-        book = self.asks()
-        return book[ book['wall'] ].iloc[1]
-        
+        return self._next_wall('asks')
+
     def best_entry(self):
-        book = self.bids(False)
-        book = book.loc[ :book[ book['wall'] ].head(1).index.min() ]
-        return book[ book['strength'] == book['strength'].min() ]['price'].max()
+        self._ensure()
+        return self._sides['bids']['best']
 
     def best_exit(self):
-        book = self.asks(False)
-        book = book.loc[ :book[ book['wall'] ].head(1).index.min() ]
-        return book[ book['strength'] == book['strength'].min() ]['price'].min()
+        self._ensure()
+        return self._sides['asks']['best']
+
+
+def strength_deciles(size):
+    """Decile (0-9) of each size by rank, ties broken by position.
+
+    Same result as `pd.qcut(pd.Series(size).rank(method='first'), 10, labels=False)`.
+    """
+    n = len(size)
+    if n == 0:
+        return np.empty(0, dtype=int)
+    ranks = np.empty(n)
+    ranks[np.argsort(size, kind='stable')] = np.arange(1, n + 1)
+    edges = np.quantile(ranks, np.linspace(0, 1, 11))
+    if len(np.unique(edges)) < len(edges):
+        return pd.qcut(ranks, 10, labels=False)
+    return np.clip(np.searchsorted(edges, ranks, side='left') - 1, 0, 9)
+
+
+def wall_flags(size):
+    """Sizes whose modified z-score (scaled by the mean absolute deviation) exceeds 1.5."""
+    if len(size) == 0:
+        return np.empty(0, dtype=bool)
+    deviation = np.abs(size - size.mean()).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1.5 < np.abs(0.6745 * (size - np.median(size))) / deviation
+
+
+def _analyze_side(rows, price, size, strength, wall, ascending):
+    """Walls and best price of one side, `rows` ordered best price first."""
+    walls = rows[wall[rows] & (size[rows] > 0)]
+    first = np.flatnonzero(wall[rows])
+    before = rows[:first[0] + 1] if len(first) else rows
+    if len(before):
+        weakest = before[strength[before] == strength[before].min()]
+        best = price[weakest].min() if ascending else price[weakest].max()
+    else:
+        best = np.nan
+    return {'rows': rows, 'walls': walls, 'best': best}
 
 
 class SupportForecastingModel():
@@ -105,17 +204,7 @@ class SupportForecastingModel():
             pass
 
     def find_groups(self, ohlc, smooth, delimiter):
-        ohlc['smooth']      = ohlc['close'].rolling(smooth).mean()
-        ohlc['delimiter']   = ohlc['close'].rolling(delimiter).mean()
-        groups              = ohlc[ (ohlc['smooth']>=ohlc['delimiter']) & (ohlc['smooth'].shift(1)<ohlc['delimiter'].shift(1)) ].reset_index()[['index']]
-        groups['next'] = groups['index'].shift(-1)
-        for i,r in groups.iterrows():
-            section  = ohlc.loc[ r['index']:r['next'] ]
-            groups.loc[i, 'high']    = section['close'].max()
-            groups.loc[i, 'low']     = section['close'].min()
-            groups.loc[i, 'h index'] = section[ section['close'] == section['close'].max() ].index.min()
-            groups.loc[i, 'l index'] = section[ section['close'] == section['close'].min() ].index.min()
-        return groups
+        return SupportResistance.find_groups(ohlc, smooth, delimiter)
     
     def draw_trend_lines(self, ohlc, low=False, high=False, periods=2):
         self.find_tops_and_bottoms(ohlc)
@@ -131,23 +220,7 @@ class SupportForecastingModel():
                 ohlc.loc[X, side[2]] = m*X+b
     
     def find_tops_and_bottoms(self, OHLC):
-        ohlc = OHLC.copy()
-        ohlc.sort_index(inplace=True)
-        self.groups  = self.find_groups(ohlc, 25, 50)
-        self.support = pd.DataFrame(
-                      self.groups[['h index','high']].values.tolist() + 
-                      self.groups[['l index','low' ]].values.tolist(),
-                      columns=['index','support']
-                  ).set_index('index').sort_index()
-        self.support['% change'] = self.support['support'] / self.support['support'].shift(1) - 1
-
-        for i,r in self.support.iterrows():
-            ohlc.loc[i:, 'last support'] = r['support']
-
-        for i,r in self.support[::-1].iterrows():
-            ohlc.loc[:i, 'next support'] = r['support']
-
-        ohlc['% from last support'] = ohlc['close'].rolling(5).mean() / ohlc['last support'] - 1
+        ohlc, self.groups, self.support = SupportResistance.find_tops_and_bottoms(OHLC, 25, 50, window=5)
         return ohlc
         
     def mean_negative_change(self):
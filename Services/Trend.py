@@ -3,9 +3,12 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report,confusion_matrix
 from sklearn.model_selection import train_test_split
+from sklearn.base import clone
 from stockstats import StockDataFrame
+from threading import Thread, Event, Lock
 import pandas as pd
 import numpy as np
+import copy, time, datetime
 pd.options.mode.chained_assignment = None
 
 class Forecast():
@@ -31,13 +34,16 @@ class Forecast():
     @Param data: historic time, open, high, low, close, volume price action data.
     """
     def __init__(self, training_data):
-        self.ohlc   = None
+        self.ohlc    = None
+        self.version = 0
+        self._lock   = Lock()
+        self._predictions = (None, {})
         self.train(training_data)
     
     def test(self, data):
         data = self.analyze(data)
-        data['direction'] = data.apply(self.direction.predict ,axis=1)
-        data['target']    = data.apply(lambda candle: candle['start price'] + (candle['start price'] * self.support.predict(candle)) ,axis=1)
+        data['direction'] = self.direction.predict_batch(data)
+        data['target']    = data['start price'] + (data['start price'] * self.support.predict_batch(data))
         data['down']      = data[data['direction']== -1]['close']
         data['up']        = data[data['direction']==  1]['close']
         data[['close','down','up']].plot(figsize=(20,5), grid=True)#,'target','support'
@@ -50,10 +56,11 @@ class Forecast():
         ohlc['x'] = 1
         ohlc[['rsi_14','macd','rsv_14']]
         ohlc['vwap'] = ((ohlc['volume'] * ohlc['low']).cumsum() / ohlc['volume'].cumsum())
-        ohlc['% change since open'] = ohlc[['open','low']].apply(lambda x: x.low / x.open - 1 ,axis=1)
-        ohlc['hour of day'] = ohlc['time'].apply( lambda x: pd.to_datetime(x,unit='s').hour)
-        ohlc['day of week'] = ohlc['time'].apply( lambda x: pd.to_datetime(x,unit='s').weekday())
-        ohlc['range']                 = ohlc['rsi_14'].apply(lambda x: -1 if x<=30 else (1 if x>=70 else 0))
+        ohlc['% change since open'] = ohlc['low'] / ohlc['open'] - 1
+        timestamp = pd.to_datetime(ohlc['time'], unit='s').dt
+        ohlc['hour of day'] = timestamp.hour.astype('int64')
+        ohlc['day of week'] = timestamp.weekday.astype('int64')
+        ohlc['range']                 = np.where(ohlc['rsi_14']<=30, -1, np.where(ohlc['rsi_14']>=70, 1, 0))
         # ohlc['range']                 = ohlc['rsv_14'].apply(lambda x: -1 if x<=20 else (1 if x>=80 else 0))
         ohlc['macd breach down']      = ((ohlc['macd'].shift(1)>=0) & (ohlc['macd']<=0)).astype(int)
         ohlc['macd breach up']        = ((ohlc['macd'].shift(1)<=0) & (ohlc['macd']>=0)).astype(int)
@@ -64,23 +71,61 @@ class Forecast():
         return ohlc
 
     def blocks(self, ohlc):
-        blocks = ohlc[(ohlc['range']!=0) | (ohlc.index.isin( ohlc.iloc[[0,-1]].index.tolist() ))]
-        blocks = blocks[blocks['range']!=blocks['range'].shift(-1)]
-        blocks['last time'] = blocks['time'].shift(1)
-        blocks = blocks[['last time','time','range','x']].reset_index(drop=True).reset_index().merge(ohlc, 'inner', 'x').dropna()
-        blocks = blocks[ (blocks['time_y']>=blocks['last time']) & (blocks['time_y']<=blocks['time_x']) ]
+        """
+        Splits the candles into blocks of trend. A block ends at the last candle of each run of
+        overbought (range 1) or oversold (range -1) candles, and at the last candle; it starts at the
+        end of the previous block. The candle on a boundary ends one block and starts the next, so it
+        is returned once for each. Candles with missing values are left out.
+
+        Block ids are assigned with a single scan, so the cost is linear in the number of candles.
+
+        @Param ohlc: the frame returned by self.indicators, sorted by time
+        @Return:     one row per candle and block it belongs to, with the 'block' id and its 'signal'
+        """
+        range_    = ohlc['range'].values
+        ends      = np.flatnonzero((range_ != 0) | ohlc.index.isin( ohlc.iloc[[0,-1]].index.tolist() ))
+        ends      = ends[np.append(range_[ends][:-1] != range_[ends][1:], True)]
+        candles   = np.flatnonzero(~ohlc.isna().any(axis=1).values)
+        times     = ohlc['time'].values[candles]
+        if (np.diff(times) <= 0).any():
+            raise ValueError('Candles must be sorted by time, without duplicate times')
+        end_times = ohlc['time'].values[ends]
+        first     = np.searchsorted(times, end_times[:-1], side='left')
+        sizes     = np.maximum(np.searchsorted(times, end_times[1:], side='right') - first, 0)
+        offsets   = np.repeat(first - (np.cumsum(sizes) - sizes), sizes)
+        block     = np.repeat(np.arange(1, len(ends)), sizes)
+        blocks    = pd.DataFrame(ohlc.iloc[candles[offsets + np.arange(sizes.sum())]]).reset_index(drop=True)
+        blocks.insert(0, 'block', block)
+        blocks['signal'] = range_[ends][block]
         return blocks
 
-    def metrics(self, ohlc):
-        ohlc = ohlc.groupby(['index','x']).agg({'close':'first','time_y':'first'}).reset_index().merge( ohlc[['index','time_y','open','high','low','close','volume','rsi_14','macd','hour of day','day of week','macd breach down','macd breach up','rsi breach oversold','rsi breach overbought','rsv breach oversold','rsv breach overbought','range_x','% change since open']], 'inner', 'index', suffixes=('_group','') )
-        ohlc.columns = ['block','x','start price','start time','time','open','high','low','close','volume','rsi','macd','hour of day','day of week','macd breach down','macd breach up','rsi breach oversold','rsi breach overbought','rsv breach oversold','rsv breach overbought','signal','% change since open']
-        blocks = ohlc[['start time','time','block']].reset_index().merge(ohlc, 'inner', 'block', suffixes=(' end',''))
-        ohlc = blocks[ (blocks.time <= blocks['time end']) & (blocks.time >= blocks['start time']) ].groupby('index').agg({'close':'max','rsi breach oversold':'sum','rsi breach overbought':'sum','rsv breach oversold':'sum','rsv breach overbought':'sum','macd breach down':'sum','macd breach up':'sum','block':'count'}).merge(ohlc, 'inner', left_index=True, right_index=True, suffixes=(' count',''))
-        ohlc['% change since block start'] = ohlc.apply(lambda x: (x['close'] / x['start price'])-1, axis=1).rolling(3).mean()
+    def metrics(self, blocks):
+        """
+        Per candle features of its block: start price and time, running candle and breach counts and
+        the % change since the block start, with the last change of the previous block as 'support'.
+        Running values use cumulative sums per block, so the cost is linear in the number of rows.
+        """
+        block  = blocks['block'].values
+        starts = np.flatnonzero(np.append(True, block[1:] != block[:-1]))
+        start  = np.repeat(starts, np.diff(np.append(starts, len(block))))
+        close  = blocks['close'].values
+        time   = blocks['time'].values
+        ohlc   = blocks[['block','time','open','high','low','close','volume','rsi_14','macd','hour of day','day of week',
+                         'macd breach down','macd breach up','rsi breach oversold','rsi breach overbought',
+                         'rsv breach oversold','rsv breach overbought','signal','% change since open']].rename(columns={'rsi_14':'rsi'})
+        ohlc['start price'] = close[start]
+        ohlc['start time']  = time[start]
+        ohlc['block count'] = np.arange(len(block)) - start + 1
+        for column in ['rsi breach oversold','rsi breach overbought','rsv breach oversold','rsv breach overbought','macd breach down','macd breach up']:
+            values = ohlc[column].values
+            total  = np.cumsum(values)
+            ohlc[column + ' count'] = total - total[start] + values[start]
+        ohlc['% change since block start'] = pd.Series(close / close[start] - 1).rolling(3).mean()
         ohlc['% short change'] = ohlc['close'].pct_change(14)
-        ohlc['time passed'] = ohlc.apply(lambda x: x['time'] - x['start time'], axis=1)
+        ohlc['time passed'] = (time - time[start]).astype(float)
         ohlc['next signal'] = ohlc['signal'].shift(-1)
-        ohlc = ohlc.merge(ohlc.rename(index=str, columns={"% change since block start": "support"}).groupby('block')[['support']].last().shift(1).reset_index(), 'inner', 'block')
+        support = ohlc.groupby('block')['% change since block start'].last().shift(1)
+        ohlc['support'] = support.reindex(block).values
         return ohlc.drop_duplicates(subset='time',keep='first').fillna(0)[[ 'block','hour of day', 'day of week', 'start time', 'time', 'start price', 'block count', 'time passed', '% change since block start','% short change', 'open','high','low','close', 'volume', 
                                                                             'rsi breach oversold count', 'rsi breach overbought count', 'rsv breach oversold count','rsv breach overbought count', 'macd breach down count', 'macd breach up count',
                                                                             'rsi', 'macd', 'macd breach down', 'macd breach up', 'rsi breach oversold', 'rsi breach overbought', 'rsv breach oversold', 'rsv breach overbought', '% change since open','support', 'signal', 'next signal' ]]
@@ -101,16 +146,39 @@ class Forecast():
         """
         metrics        = self.analyze(ohlc)
         support        = self.support_set(metrics)
-        self.limits    = support.groupby('signal')[['block count','% change since block start','rsi breach oversold count','rsi breach overbought count','rsv breach oversold count','rsv breach overbought count','macd breach down count','macd breach up count']].mean()
-        self.direction = Direction(metrics)
-        self.support   = Support(support)
+        self.swap(Direction(metrics), Support(support.copy()), support, metrics['time'].max())
+
+    def swap(self, direction, support, support_set, trained_until):
+        """
+        Replaces the models at once, so a concurrent prediction uses either the old or the new pair.
+
+        @Param support_set:   the block rows the support model was trained on
+        @Param trained_until: time of the last candle the models were trained on
+        """
+        limits = support_set.groupby('signal')[['block count','% change since block start','rsi breach oversold count','rsi breach overbought count','rsv breach oversold count','rsv breach overbought count','macd breach down count','macd breach up count']].mean()
+        with self._lock:
+            self.direction      = direction
+            self.support        = support
+            self.support_levels = support_set
+            self.limits         = limits
+            self.trained_until  = trained_until
+            self.retrained      = time.time()
+            self.version       += 1
+
+    def completed_blocks(self, ohlc):
+        """
+        Candles in ohlc (see self.analyze) after the last candle the models were trained on, from the
+        first block that ends after it on; a block that straddles it adds only its later candles. The
+        last two blocks are left out, the forming candle can still move their boundaries.
+        """
+        forming = ohlc['block'].unique()[-2:]
+        return ohlc[ (~ohlc['block'].isin(forming)) & (ohlc['time'] > self.trained_until) ]
     
     def process(self, df):
         """ 
         This method returns the predicted directions of trend based on the knn classification model.
-
-        Note! this method will select the last 500 records in the df to base the prediction on. This is to
-        improve perfomance
+        The whole df is analyzed; blocks and metrics are computed in linear time. Only the candles the
+        direction is based on are predicted, see self.predict.
 
         @Param df: A dataframe containing the time, open, high, low, close, and volume. This df will be 
                    processed, and the periods between overbought, and oversold will analyzed to find key 
@@ -118,13 +186,39 @@ class Forecast():
 
         @Return:   returns the direction 1 = up, -1 = down, 0 = neutral/transition 
         """
-        self.ohlc = self.analyze(df.tail(1000))
-        self.ohlc['direction'] = self.ohlc.apply(self.direction.predict ,axis=1)
-        self.ohlc['target']    = self.ohlc.apply(lambda candle: candle['start price'] + (candle['start price'] * self.support.predict(candle)) ,axis=1) #
-        changed   = abs(self.ohlc['direction'].iloc[-6:-1].mean()) != 1
-        direction = 0 if abs(self.ohlc['direction'].iloc[-4:-1].mean()) != 1 else self.ohlc['direction'].iloc[-3:-1].mean()
+        ohlc      = self.analyze(df)
+        candles   = ohlc.iloc[-6:-1]
+        ohlc['direction'], ohlc['target'] = np.nan, np.nan
+        ohlc.loc[candles.index, ['direction','target']] = self.predict(candles)
+        self.ohlc = ohlc
+        changed   = abs(ohlc['direction'].iloc[-6:-1].mean()) != 1
+        direction = 0 if abs(ohlc['direction'].iloc[-4:-1].mean()) != 1 else ohlc['direction'].iloc[-3:-1].mean()
         return changed, direction
 
+    def predict(self, candles):
+        """
+        Predicted direction and target of analyzed candles, in one batch per model. Predictions are
+        cached by candle time with the features they were made from, so a candle that did not change
+        since the last call is not predicted again, until the models are swapped.
+
+        @Param candles: rows of the frame returned by self.analyze
+        @Return:        array with a direction and a target column
+        """
+        with self._lock:
+            version, direction, support = self.version, self.direction, self.support
+        cache    = self._predictions[1] if self._predictions[0] == version else {}
+        features = direction.features + support.features + ['start price']
+        values   = candles[features].values
+        cached   = [cache.get(time) for time in candles['time'].values]
+        stale    = [i for i, hit in enumerate(cached) if hit is None or not np.array_equal(hit[0], values[i])]
+        if stale:
+            rows      = candles.iloc[stale]
+            predicted = zip(direction.predict_batch(rows), rows['start price'].values + (rows['start price'].values * support.predict_batch(rows)))
+            for i, (d, t) in zip(stale, predicted):
+                cached[i] = (values[i], d, t)
+        self._predictions = (version, { time: hit for time, hit in zip(candles['time'].values, cached) })
+        return np.array([ hit[1:] for hit in cached ]).reshape(-1, 2)
+
 class Direction():
     def __init__(self, metrics):
         self.knn      = KNeighborsClassifier(n_neighbors=5, weights='distance')
@@ -140,6 +234,9 @@ class Direction():
         
     def predict(self, candle):
         return self.knn.predict(self.scaler.transform([candle[self.features].values.tolist()]))[0]
+
+    def predict_batch(self, candles):
+        return self.knn.predict(self.scaler.transform(candles[self.features].values))
     
     def report(self):
         X_train, X_test, y_train, y_test = train_test_split(self.X, self.y, test_size=0.1, random_state=42)
@@ -153,20 +250,44 @@ class Direction():
         self.train(metrics)
         
     def train(self, metrics):
-        self.scaler.fit(metrics[self.features])
+        # As an array: the features repeat the rsi breach counts (weighting them twice), which
+        # sklearn rejects in a DataFrame
+        self.scaler.fit(metrics[self.features].values)
+        self.raw = metrics[self.features].values
         self.X = self.scaler.transform(metrics[self.features].values.tolist())
         self.y = metrics[self.target].values.tolist()
         self.knn.fit(self.X, self.y)
+
+    def updated(self, metrics, window=None):
+        """
+        Returns a copy of the model with the candles in metrics added, this model is left untouched.
+        The scaler statistics are updated with partial_fit, then the KNN is rebuilt on the last
+        window candles (all of them when window is None).
+        """
+        last      = slice(-window if window else None, None)
+        direction = copy.copy(self)
+        direction.scaler = copy.deepcopy(self.scaler)
+        direction.scaler.partial_fit(metrics[self.features].values)
+        direction.raw = np.concatenate((self.raw, metrics[self.features].values))[last]
+        direction.y   = (list(self.y) + metrics[self.target].values.tolist())[last]
+        direction.X   = direction.scaler.transform(direction.raw)
+        direction.knn = clone(self.knn)
+        direction.knn.fit(direction.X, direction.y)
+        return direction
         
 class Support():
     def __init__(self, support_levels):
-        self.lm       = LinearRegression(normalize=True)
+        # Least squares fits are scale invariant, so this is what normalize=True (removed from sklearn) fitted
+        self.lm       = LinearRegression()
         self.target   = 'next support'
         self.features = ['support']
         self.train(support_levels)
         
     def predict(self, candle):
         return self.lm.predict([candle[self.features].values.tolist()])[0]
+
+    def predict_batch(self, candles):
+        return self.lm.predict(candles[self.features].values)
     
     def train(self, support_levels):
         support_levels['next support'] = support_levels['support'].shift(-1)
@@ -174,6 +295,81 @@ class Support():
         X = support_levels[self.features]
         y = support_levels[self.target]
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.1, random_state=42)
-        self.lm.fit(X_train, y_train)
+        self.lm.fit(X_train.values, y_train)
         self.cdf = pd.DataFrame(self.lm.coef_, X.columns, columns=['Coefficiant'])
 
+
+class Retrainer():
+    """
+    Online retraining of a Forecast during a live session...
+
+    Every cadence seconds the blocks completed since the last training in forecast.ohlc (the frame
+    of the last forecast.process call) are added to the training set: the direction model updates its
+    scaler statistics and rebuilds the KNN on the last window candles, the support model is refitted
+    on all block rows. The new models are built on a background thread and swapped in at once, the
+    bot keeps predicting with the old ones meanwhile.
+
+    @Variables:
+           metrics: retrains done, candles and blocks added, seconds spent in the last retrain
+
+    @Param forecast:   a trained Forecast
+    @Param cadence:    seconds between retrains
+    @Param window:     most recent candles the KNN is rebuilt on, None keeps every candle
+    @Param min_blocks: completed blocks needed before a retrain
+    """
+    def __init__(self, forecast, cadence=3600, window=100000, min_blocks=1):
+        self.forecast   = forecast
+        self.cadence    = cadence
+        self.window     = window
+        self.min_blocks = min_blocks
+        self.thread     = None
+        self._stop      = Event()
+        self._lock      = Lock()
+        self.metrics    = {'retrains': 0, 'candles': 0, 'blocks': 0, 'seconds': 0.0}
+
+    def start(self):
+        def run():
+            while not self._stop.wait(self.cadence):
+                try:
+                    self.retrain()
+                except Exception as e:
+                    print("{}: retrain failed: {}".format(datetime.datetime.now(), e))
+
+        self._stop.clear()
+        self.thread = Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def time_since_retrain(self):
+        return time.time() - self.forecast.retrained
+
+    def retrain(self):
+        """
+        Adds the completed blocks and swaps the updated models into the forecast.
+
+        @Return: True when the models were replaced
+        """
+        with self._lock:
+            started  = time.time()
+            forecast = self.forecast
+            ohlc     = forecast.ohlc
+            if ohlc is None:
+                return False
+            metrics  = forecast.completed_blocks(ohlc)
+            if metrics['block'].nunique() < self.min_blocks:
+                return False
+            # Block rows are built from all candles of the blocks, including a straddling block's earlier ones
+            blocks    = ohlc[ohlc['block'].isin(metrics['block'].unique())]
+            support   = pd.concat([forecast.support_levels, forecast.support_set(blocks)], ignore_index=True)
+            direction = forecast.direction.updated(metrics, self.window)
+            forecast.swap(direction, Support(support.copy()), support, metrics['time'].max())
+            self.metrics['retrains'] += 1
+            self.metrics['candles']  += len(metrics)
+            self.metrics['blocks']   += metrics['block'].nunique()
+            self.metrics['seconds']   = time.time() - started
+            return True
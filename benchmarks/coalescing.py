@@ -0,0 +1,56 @@
+#
+# benchmarks/coalescing.py
+#
+# Checks GET coalescing in the RequestScheduler against the local stub server:
+# concurrent identical GETs of one client are sent once, while signed GETs of
+# clients with different API keys are never shared.
+#
+#   python -m benchmarks.coalescing [--delay S]
+
+import argparse
+import threading
+
+from Connections.gdax.authenticated_client import AuthenticatedClient
+from Connections.gdax.rate_limit import TokenBucket
+from Connections.gdax.scheduler import RequestScheduler
+from benchmarks.stub_server import serve
+
+
+def concurrently(*calls):
+    """Results of `calls`, all started at once."""
+    results = [None] * len(calls)
+    def run(i):
+        results[i] = calls[i]()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=0.2, help='stub response delay, so the calls overlap')
+    args = parser.parse_args()
+
+    server, url = serve(delay=args.delay)
+    secret = 'c2VjcmV0'
+    try:
+        scheduler = RequestScheduler(TokenBucket(1e9, 1e9), TokenBucket(1e9, 1e9))
+        alice = AuthenticatedClient('alice', secret, 'passphrase', url=url, scheduler=scheduler)
+        bob = AuthenticatedClient('bob', secret, 'passphrase', url=url, scheduler=scheduler)
+
+        # Same client, same GET: sent once
+        first, second = concurrently(alice.get_accounts, alice.get_accounts)
+        assert first == second and first[0]['profile_id'] == 'alice'
+        assert scheduler.metrics['requests'] == 1 and scheduler.metrics['coalesced'] == 1, scheduler.metrics
+        print('same API key: 2 calls, 1 request')
+
+        # Different API keys, same GET: each account gets its own response
+        accounts = concurrently(alice.get_accounts, bob.get_accounts, bob.get_accounts)
+        assert [result[0]['profile_id'] for result in accounts] == ['alice', 'bob', 'bob'], accounts
+        assert scheduler.metrics['requests'] == 3 and scheduler.metrics['coalesced'] == 2, scheduler.metrics
+        print('different API keys: 3 calls, 2 requests, no responses shared across accounts')
+    finally:
+        server.shutdown()
@@ -0,0 +1,50 @@
+#
+# benchmarks/decode_backends.py
+#
+# Compares the websocket decoder backends on a recorded feed capture, decoding
+# alone and decoding plus the order book handler (PriceLevelBook)
+#
+#   python -m benchmarks.decode_backends [capture] [--count N]
+
+import argparse
+import json
+import time
+
+from Connections.gdax.decoder import Decoder, available_backends, msgspec
+from Connections.gdax.price_level_book import PriceLevelBook
+from benchmarks.feed import load_capture, synthetic_level3
+from benchmarks.order_book_replay import replay
+
+
+def measure(decoder, frames, repeat, book=False):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if book:
+            replay(PriceLevelBook(), map(decoder.decode, frames))
+        else:
+            for frame in frames:
+                decoder.decode(frame)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(frames) / best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture', nargs='?', help='OrderBook log_to pickle or JSON lines file')
+    parser.add_argument('--count', type=int, default=200000, help='synthetic messages when no capture is given')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    messages = load_capture(args.capture) if args.capture else synthetic_level3(args.count)
+    frames = [json.dumps(message) for message in messages]
+    print('{} frames, {:.1f} MB'.format(len(frames), sum(len(frame) for frame in frames) / 1e6))
+    for backend in available_backends():
+        # Typed messages are always decoded by msgspec, so they are timed once
+        for typed in ((False, True) if backend == 'msgspec' else (False,)) if msgspec is not None else (False,):
+            decoder = Decoder(backend, typed=typed)
+            decode = measure(decoder, frames, args.repeat)
+            book = measure(decoder, frames, args.repeat, book=True)
+            print('{:8} {:6} decode {:>12,.0f} frames/sec  decode + book {:>12,.0f} frames/sec'.format(
+                backend, 'typed' if typed else 'dict', decode, book))
@@ -0,0 +1,117 @@
+#
+# benchmarks/feed.py
+#
+# Recorded and synthetic gdax feed captures shared by the benchmarks
+
+import json
+import pickle
+import random
+import uuid
+
+
+def load_capture(path):
+    """Load a feed capture.
+
+    Accepts either the pickle stream written by `OrderBook(log_to=...)` or a
+    text file with one raw JSON frame per line.
+
+    Returns:
+        list: Decoded messages in feed order.
+
+    """
+    with open(path, 'rb') as f:
+        if f.read(1) == b'\x80':
+            f.seek(0)
+            messages = []
+            while True:
+                try:
+                    messages.append(pickle.load(f))
+                except EOFError:
+                    return messages
+        f.seek(0)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_level3(count=200000, product_id='BTC-USD', mid=6500.0, seed=42):
+    """Generate a consistent level 3 (`full` channel) message stream.
+
+    Orders are opened on both sides of `mid` and then cancelled, matched at
+    the front of the best level or resized, roughly in the proportions seen
+    on a busy BTC-USD book.
+
+    Returns:
+        list: `count` messages with consecutive sequence numbers.
+
+    """
+    rng = random.Random(seed)
+    live = {}
+    ids = []
+    levels = {'buy': {}, 'sell': {}}
+    messages = []
+    sequence = 1
+    while len(messages) < count:
+        roll = rng.random()
+        if roll < 0.45 or len(ids) < 1000:
+            side = 'buy' if rng.random() < 0.5 else 'sell'
+            offset = abs(rng.gauss(0, 5)) + 0.01
+            price = '{:.2f}'.format(mid - offset if side == 'buy' else mid + offset)
+            order = {'order_id': str(uuid.UUID(int=rng.getrandbits(128))),
+                     'side': side,
+                     'price': price,
+                     'size': rng.randint(100000, 200000000)}
+            live[order['order_id']] = order
+            ids.append(order['order_id'])
+            levels[side].setdefault(price, []).append(order['order_id'])
+            messages.append({'type': 'open', 'side': side, 'product_id': product_id,
+                             'order_id': order['order_id'], 'price': price,
+                             'remaining_size': _format_size(order['size']), 'sequence': sequence})
+        elif roll < 0.85:
+            i = rng.randrange(len(ids))
+            ids[i], ids[-1] = ids[-1], ids[i]
+            order = live.pop(ids.pop())
+            _unlink(levels, order)
+            messages.append({'type': 'done', 'side': order['side'], 'product_id': product_id,
+                             'order_id': order['order_id'], 'price': order['price'],
+                             'remaining_size': _format_size(order['size']), 'reason': 'canceled',
+                             'sequence': sequence})
+        elif roll < 0.95:
+            side = 'buy' if rng.random() < 0.5 else 'sell'
+            book = levels[side]
+            if not book:
+                continue
+            price = max(book, key=float) if side == 'buy' else min(book, key=float)
+            order = live[book[price][0]]
+            size = int(order['size'] * rng.uniform(0.1, 1.2))
+            if size >= order['size']:
+                size = order['size']
+                del live[order['order_id']]
+                ids.remove(order['order_id'])
+                _unlink(levels, order)
+            else:
+                order['size'] -= size
+            messages.append({'type': 'match', 'side': side, 'product_id': product_id,
+                             'maker_order_id': order['order_id'],
+                             'taker_order_id': str(uuid.UUID(int=rng.getrandbits(128))),
+                             'price': price, 'size': _format_size(size),
+                             'trade_id': sequence, 'sequence': sequence})
+        else:
+            order = live[ids[rng.randrange(len(ids))]]
+            new_size = max(int(order['size'] * rng.uniform(0.1, 0.9)), 1)
+            messages.append({'type': 'change', 'side': order['side'], 'product_id': product_id,
+                             'order_id': order['order_id'], 'price': order['price'],
+                             'old_size': _format_size(order['size']), 'new_size': _format_size(new_size),
+                             'sequence': sequence})
+            order['size'] = new_size
+        sequence += 1
+    return messages
+
+
+def _format_size(satoshis):
+    return '{}.{:08d}'.format(*divmod(satoshis, 100000000))
+
+
+def _unlink(levels, order):
+    level = levels[order['side']][order['price']]
+    level.remove(order['order_id'])
+    if not level:
+        del levels[order['side']][order['price']]
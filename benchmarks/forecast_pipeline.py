@@ -0,0 +1,90 @@
+#
+# benchmarks/forecast_pipeline.py
+#
+# Per-call cost of the Forecast feature pipeline on synthetic candles, against
+# the previous row-wise and cross-join implementations, which must give
+# identical frames.
+#
+#   python -m benchmarks.forecast_pipeline [--sizes 1000 10000 100000] [--legacy-blocks-size N]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from stockstats import StockDataFrame
+
+from Services.Trend import Forecast
+from benchmarks.support_resistance import candles
+
+
+def legacy_indicators(data):
+    ohlc = StockDataFrame.retype( data[['time','low','high','open','close','volume']].copy() )
+    ohlc['x'] = 1
+    ohlc[['rsi_14','macd','rsv_14']]
+    ohlc['vwap'] = ((ohlc['volume'] * ohlc['low']).cumsum() / ohlc['volume'].cumsum())
+    ohlc['% change since open'] = ohlc[['open','low']].apply(lambda x: x.low / x.open - 1 ,axis=1)
+    ohlc['hour of day'] = ohlc['time'].apply( lambda x: pd.to_datetime(x,unit='s').hour)
+    ohlc['day of week'] = ohlc['time'].apply( lambda x: pd.to_datetime(x,unit='s').weekday())
+    ohlc['range']                 = ohlc['rsi_14'].apply(lambda x: -1 if x<=30 else (1 if x>=70 else 0))
+    ohlc['macd breach down']      = ((ohlc['macd'].shift(1)>=0) & (ohlc['macd']<=0)).astype(int)
+    ohlc['macd breach up']        = ((ohlc['macd'].shift(1)<=0) & (ohlc['macd']>=0)).astype(int)
+    ohlc['rsi breach oversold']   = ((ohlc['rsi_14'].shift(1)>=30) & (ohlc['rsi_14']<=30)).astype(int)
+    ohlc['rsi breach overbought'] = ((ohlc['rsi_14'].shift(1)<=70) & (ohlc['rsi_14']>=70)).astype(int)
+    ohlc['rsv breach oversold']   = ((ohlc['rsv_14'].shift(1)>=20) & (ohlc['rsv_14']<=20)).astype(int)
+    ohlc['rsv breach overbought'] = ((ohlc['rsv_14'].shift(1)<=80) & (ohlc['rsv_14']>=80)).astype(int)
+    return ohlc
+
+
+def legacy_blocks(ohlc):
+    blocks = ohlc[(ohlc['range']!=0) | (ohlc.index.isin( ohlc.iloc[[0,-1]].index.tolist() ))]
+    blocks = blocks[blocks['range']!=blocks['range'].shift(-1)]
+    blocks['last time'] = blocks['time'].shift(1)
+    blocks = blocks[['last time','time','range','x']].reset_index(drop=True).reset_index().merge(ohlc, 'inner', 'x').dropna()
+    blocks = blocks[ (blocks['time_y']>=blocks['last time']) & (blocks['time_y']<=blocks['time_x']) ]
+    return blocks
+
+
+def legacy_metrics(ohlc):
+    ohlc = ohlc.groupby(['index','x']).agg({'close':'first','time_y':'first'}).reset_index().merge( ohlc[['index','time_y','open','high','low','close','volume','rsi_14','macd','hour of day','day of week','macd breach down','macd breach up','rsi breach oversold','rsi breach overbought','rsv breach oversold','rsv breach overbought','range_x','% change since open']], 'inner', 'index', suffixes=('_group','') )
+    ohlc.columns = ['block','x','start price','start time','time','open','high','low','close','volume','rsi','macd','hour of day','day of week','macd breach down','macd breach up','rsi breach oversold','rsi breach overbought','rsv breach oversold','rsv breach overbought','signal','% change since open']
+    blocks = ohlc[['start time','time','block']].reset_index().merge(ohlc, 'inner', 'block', suffixes=(' end',''))
+    ohlc = blocks[ (blocks.time <= blocks['time end']) & (blocks.time >= blocks['start time']) ].groupby('index').agg({'close':'max','rsi breach oversold':'sum','rsi breach overbought':'sum','rsv breach oversold':'sum','rsv breach overbought':'sum','macd breach down':'sum','macd breach up':'sum','block':'count'}).merge(ohlc, 'inner', left_index=True, right_index=True, suffixes=(' count',''))
+    ohlc['% change since block start'] = ohlc.apply(lambda x: (x['close'] / x['start price'])-1, axis=1).rolling(3).mean()
+    ohlc['% short change'] = ohlc['close'].pct_change(14)
+    ohlc['time passed'] = ohlc.apply(lambda x: x['time'] - x['start time'], axis=1)
+    ohlc['next signal'] = ohlc['signal'].shift(-1)
+    ohlc = ohlc.merge(ohlc.rename(index=str, columns={"% change since block start": "support"}).groupby('block')[['support']].last().shift(1).reset_index(), 'inner', 'block')
+    return ohlc.drop_duplicates(subset='time',keep='first').fillna(0)[[ 'block','hour of day', 'day of week', 'start time', 'time', 'start price', 'block count', 'time passed', '% change since block start','% short change', 'open','high','low','close', 'volume',
+                                                                        'rsi breach oversold count', 'rsi breach overbought count', 'rsv breach oversold count','rsv breach overbought count', 'macd breach down count', 'macd breach up count',
+                                                                        'rsi', 'macd', 'macd breach down', 'macd breach up', 'rsi breach oversold', 'rsi breach overbought', 'rsv breach oversold', 'rsv breach overbought', '% change since open','support', 'signal', 'next signal' ]]
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-blocks-size', type=int, default=10000, help='largest size for the (quadratic) old blocks/metrics')
+    args = parser.parse_args()
+
+    forecast = Forecast.__new__(Forecast)
+    for size in args.sizes:
+        data = candles(size)
+        expected, legacy = timed(legacy_indicators, data)
+        result, vectorized = timed(forecast.indicators, data)
+        pd.testing.assert_frame_equal(pd.DataFrame(result), pd.DataFrame(expected))
+        print('indicators {:>7} candles  legacy {:8.3f} s  vectorized {:8.4f} s'.format(size, legacy, vectorized))
+
+        if size <= args.legacy_blocks_size:
+            expected, legacy = timed(lambda: legacy_metrics(legacy_blocks(result)))
+            metrics, linear = timed(lambda: forecast.metrics(forecast.blocks(result)))
+            pd.testing.assert_frame_equal(metrics, expected)
+            print('metrics    {:>7} candles  legacy {:8.3f} s  linear     {:8.4f} s'.format(size, legacy, linear))
+        else:
+            metrics, linear = timed(lambda: forecast.metrics(forecast.blocks(result)))
+            print('metrics    {:>7} candles  linear     {:8.4f} s'.format(size, linear))
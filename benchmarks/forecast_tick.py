@@ -0,0 +1,51 @@
+#
+# benchmarks/forecast_tick.py
+#
+# Per-tick latency of Forecast.process, one new candle per tick, against the
+# previous per-row DataFrame.apply predictions, which must give the same result.
+#
+#   python -m benchmarks.forecast_tick [--train N] [--history N] [--ticks N]
+
+import argparse
+import time
+
+import numpy as np
+
+from Services.Trend import Forecast
+from benchmarks.support_resistance import candles
+
+
+def legacy_process(forecast, df):
+    ohlc = forecast.analyze(df)
+    ohlc['direction'] = ohlc.apply(forecast.direction.predict ,axis=1)
+    ohlc['target']    = ohlc.apply(lambda candle: candle['start price'] + (candle['start price'] * forecast.support.predict(candle)) ,axis=1)
+    changed   = abs(ohlc['direction'].iloc[-6:-1].mean()) != 1
+    direction = 0 if abs(ohlc['direction'].iloc[-4:-1].mean()) != 1 else ohlc['direction'].iloc[-3:-1].mean()
+    return changed, direction
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--train', type=int, default=20000, help='candles the models are trained on')
+    parser.add_argument('--history', type=int, default=2000, help='candles processed on the first tick')
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    data = candles(args.train + args.history + args.ticks)
+    forecast = Forecast(data.iloc[:args.train])
+    legacy, batch = [], []
+    for tick in range(args.ticks):
+        df = data.iloc[args.train:args.train + args.history + tick + 1]
+        expected, seconds = timed(legacy_process, forecast, df)
+        legacy.append(seconds)
+        result, seconds = timed(forecast.process, df)
+        batch.append(seconds)
+        assert result == expected, (result, expected)
+    print('{:>7} candles  per tick  legacy {:8.4f} s  batch {:8.4f} s  (median of {} ticks, identical)'.format(
+        args.history, np.median(legacy), np.median(batch), args.ticks))
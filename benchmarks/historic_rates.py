@@ -0,0 +1,99 @@
+#
+# benchmarks/historic_rates.py
+#
+# Checks HistoricRates against the local stub server: windows on the fixed
+# grid, deduplication, the request rate limit and reuse of the on-disk cache
+# (including ranges that are only partly cached).
+#
+#   python -m benchmarks.historic_rates [--rate R] [--candles N]
+
+import argparse
+import calendar
+import shutil
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from Connections.gdax.historic_rates import HistoricRates
+from Connections.gdax.public_client import PublicClient
+from Connections.gdax.rate_limit import TokenBucket
+from Connections.gdax.scheduler import RequestScheduler
+from benchmarks.stub_server import serve
+
+
+def requested(log, since=0):
+    """(start, end) epoch ranges of the candle requests after position `since` of the log, end exclusive."""
+    windows = []
+    for _, _, path in log[since:]:
+        url = urlparse(path)
+        if url.path.endswith('/candles'):
+            query = parse_qs(url.query)
+            epoch = lambda name: calendar.timegm(time.strptime(query[name][0], '%Y-%m-%dT%H:%M:%SZ'))
+            windows.append((epoch('start'), epoch('end') + int(query['granularity'][0])))
+    return sorted(windows)
+
+
+def check(rates, start, end, granularity):
+    times = rates.fetch('BTC-USD', start, end, granularity)[:, 0]
+    assert np.array_equal(times, np.arange(start, end, granularity)), 'candles missing, duplicated or out of order'
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=10.0, help='HistoricRates requests per second')
+    parser.add_argument('--candles', type=int, default=1000, help='candles in the first range')
+    args = parser.parse_args()
+
+    log = []
+    server, url = serve(log=log)
+    # HistoricRates does its own throttling; the scheduler must not add any
+    client = PublicClient(api_url=url, scheduler=RequestScheduler(TokenBucket(1e9, 1e9), TokenBucket(1e9, 1e9)))
+    cache_dir = tempfile.mkdtemp()
+    granularity = 60
+    step = HistoricRates.MAX_CANDLES * granularity
+    try:
+        rates = HistoricRates(client, cache_dir=cache_dir, rate=args.rate)
+        start = (int(time.time()) - 30 * 86400) // step * step + 100 * granularity
+        end = start + args.candles * granularity
+
+        # Window splitting and the rate limit
+        check(rates, start, end, granularity)
+        windows = requested(log)
+        assert all(hi - lo <= step for lo, hi in windows), windows
+        assert all(lo % step == 0 for lo, _ in windows[1:]) and all(hi % step == 0 for _, hi in windows[:-1]), windows
+        assert windows[0][0] == start and windows[-1][1] == end
+        sent = sorted(when for when, _, path in log)
+        assert sent[-1] - sent[0] >= (len(sent) - 1) / args.rate * 0.9, 'requests sent faster than the rate limit'
+        print('{} candles in {} grid windows, {:.1f} requests/sec'.format(
+            args.candles, len(windows), (len(sent) - 1) / (sent[-1] - sent[0])))
+
+        # A new instance reuses the .json coverage next to the cache
+        seen = len(log)
+        check(HistoricRates(client, cache_dir=cache_dir, rate=args.rate), start, end, granularity)
+        assert len(log) == seen, 'cached range fetched again'
+        print('cached range: no requests')
+
+        # Half cached: only the missing part is fetched
+        seen = len(log)
+        later = end + args.candles * granularity
+        check(rates, start + args.candles // 2 * granularity, later, granularity)
+        windows = requested(log, seen)
+        assert windows[0][0] == end and sum(hi - lo for lo, hi in windows) == later - end, windows
+        print('half cached range: {} windows, all outside the cache'.format(len(windows)))
+
+        # Up to now: the recent window is not marked covered, so it is fetched again and deduplicated
+        now = int(time.time()) // granularity * granularity
+        recent = now - 2 * args.candles * granularity
+        check(rates, recent, now, granularity)
+        seen = len(log)
+        check(rates, recent, now, granularity)
+        assert len(log) > seen, 'incomplete recent window was not refreshed'
+        cached = np.load(rates._path('BTC-USD', granularity) + '.npy')
+        assert len(np.unique(cached[:, 0])) == len(cached), 'duplicate candles in the cache'
+        print('recent range refreshed, {} cached candles, no duplicates'.format(len(cached)))
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,99 @@
+#
+# benchmarks/indicators.py
+#
+# Incremental IndicatorEngine against a full stockstats recomputation, on
+# synthetic candles with flat stretches and rewrites of the forming candle.
+# Checks both give the same values, then times TimeSeriesAnalysis.analyze per
+# tick on a sliding window and compares it with the stockstats fallback on
+# that window, which agrees once the window's warm-up rows are past.
+#
+#   python -m benchmarks.indicators [--count N] [--window N] [--ticks N]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from stockstats import StockDataFrame
+
+from Services.Indicators import IndicatorEngine, COLUMNS
+from Services.TechnicalAnalysis import TimeSeriesAnalysis
+from benchmarks.support_resistance import candles
+
+INDICATORS = ['rsi_14', 'macd', 'rsv_14', 'close_10_sma', 'close_10_ema']
+# Rows after which the EMA start-up terms of a window are below 1e-9
+WARMUP = 400
+
+
+def fixture(count, seed=0):
+    """Candles with flat stretches, where RSI gains/losses and the RSV range are 0."""
+    ohlc = candles(count, seed)
+    rnd = np.random.default_rng(seed)
+    for start in rnd.integers(0, count - 30, count // 200):
+        flat = ohlc.index[start:start + rnd.integers(5, 30)]
+        ohlc.loc[flat, ['low', 'high', 'open', 'close']] = ohlc['close'].iloc[start]
+    return ohlc
+
+
+def stockstats(ohlc):
+    frame = StockDataFrame.retype(ohlc[COLUMNS].copy())
+    frame[INDICATORS]
+    return frame
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=3000)
+    parser.add_argument('--window', type=int, default=600, help='candles per window, more than {}'.format(WARMUP))
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    ohlc = fixture(args.count)
+    expected = stockstats(ohlc)
+    columns = [column for column in expected.columns if column not in COLUMNS]
+
+    # One candle at a time, each first written with another close and then rewritten
+    engine = IndicatorEngine(INDICATORS, capacity=16, max_rows=args.count // 3)
+    for row in ohlc[COLUMNS].values:
+        forming = row.copy()
+        forming[COLUMNS.index('close')] = forming[COLUMNS.index('open')]
+        engine.update(*forming)
+        engine.update(*row)
+    result = engine.rows(ohlc['time'].values)
+    kept = ~np.isnan(result[:, 0])
+    assert kept.sum() == len(engine) and len(engine) <= args.count // 3
+    np.testing.assert_allclose(result[kept][:, len(COLUMNS):], expected[columns].values[kept], rtol=1e-9, atol=1e-9)
+    print('IndicatorEngine matches stockstats on {} candles ({})'.format(len(ohlc), ', '.join(columns)))
+
+    # Sliding window: the frame covers the window only, with its index
+    window = ohlc.iloc[:args.window]
+    analysis = TimeSeriesAnalysis(window, INDICATORS)
+    analysis.analyze()
+    incremental, full = [], []
+    for tick in range(1, args.ticks + 1):
+        window = ohlc.iloc[tick:tick + args.window]
+        analysis.OHLC = window
+        result, seconds = timed(analysis.analyze)
+        incremental.append(seconds)
+        _, seconds = timed(stockstats, window)
+        full.append(seconds)
+    assert len(result) == len(window) and result.index.equals(window.index)
+    pd.testing.assert_frame_equal(pd.DataFrame(result[COLUMNS]), window[COLUMNS])
+    np.testing.assert_allclose(result[columns].values, expected[columns].loc[window.index].values, rtol=1e-9, atol=1e-9)
+
+    # The fallback path recomputes stockstats on the window alone: the same values after its warm-up rows
+    fallback = TimeSeriesAnalysis(window, INDICATORS)
+    fallback.engine = None
+    windowed = fallback.analyze()
+    np.testing.assert_allclose(result[columns].values[WARMUP:], windowed[columns].values[WARMUP:], rtol=1e-9, atol=1e-9)
+    divergence = np.nanmax(np.abs(result[columns].values[:WARMUP] - windowed[columns].values[:WARMUP]), axis=0)
+    print('fallback on the window agrees after {} warm-up rows; before, up to {}'.format(
+        WARMUP, ', '.join('{} {:.3g}'.format(column, value) for column, value in zip(columns, divergence))))
+    print('{} candle window  per tick  stockstats {:8.4f} s  incremental {:8.4f} s  (median of {} ticks)'.format(
+        args.window, np.median(full), np.median(incremental), args.ticks))
@@ -0,0 +1,46 @@
+#
+# benchmarks/order_book_replay.py
+#
+# Replays level 3 messages through the order book engine and reports messages/sec
+#
+#   python -m benchmarks.order_book_replay [capture] [--count N]
+
+import argparse
+import time
+
+from Connections.gdax.price_level_book import PriceLevelBook
+from benchmarks.feed import load_capture, synthetic_level3
+
+
+def replay(book, messages):
+    for message in messages:
+        msg_type = message['type']
+        if msg_type == 'open':
+            book.add(message)
+        elif msg_type == 'done' and 'price' in message:
+            book.remove(message)
+        elif msg_type == 'match':
+            book.match(message)
+        elif msg_type == 'change':
+            book.change(message)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture', nargs='?', help='OrderBook log_to pickle or JSON lines file')
+    parser.add_argument('--count', type=int, default=500000, help='synthetic messages when no capture is given')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    messages = load_capture(args.capture) if args.capture else synthetic_level3(args.count)
+    best = None
+    for _ in range(args.repeat):
+        book = PriceLevelBook()
+        started = time.perf_counter()
+        replay(book, messages)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    print('{} messages, {} resting orders, bid {} ask {}'.format(
+        len(messages), len(book), book.get_bid(), book.get_ask()))
+    print('{:,.0f} messages/sec'.format(len(messages) / best))
@@ -0,0 +1,74 @@
+#
+# benchmarks/rest_latency.py
+#
+# Per-call latency of the REST clients with and without a pooled session,
+# against the local stub server (or any URL given with --url)
+#
+#   python -m benchmarks.rest_latency [--url URL] [--count N]
+
+import argparse
+import time
+
+import numpy as np
+import requests
+
+from Connections.gdax.authenticated_client import AuthenticatedClient
+from Connections.gdax.http_session import create_session
+from Connections.gdax.rate_limit import TokenBucket
+from Connections.gdax.scheduler import RequestScheduler
+from benchmarks.stub_server import serve
+
+
+class _Unpooled(object):
+    """Session look-alike that sends every call through module-level `requests`,
+    i.e. a new connection per call, as the clients did before."""
+
+    def request(self, method, url, **kwargs):
+        return requests.request(method, url, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return requests.get(*args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return requests.post(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return requests.delete(*args, **kwargs)
+
+
+def measure(client, count):
+    calls = [
+        ('get_product_ticker', lambda: client.get_product_ticker('BTC-USD')),
+        ('buy', lambda: client.buy(price='100.00', size='0.01', product_id='BTC-USD')),
+        ('cancel_order', lambda: client.cancel_order('0' * 32)),
+    ]
+    results = {}
+    for name, call in calls:
+        call()
+        latencies = np.empty(count)
+        for i in range(count):
+            started = time.perf_counter()
+            call()
+            latencies[i] = time.perf_counter() - started
+        results[name] = latencies * 1000
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='API URL, defaults to a local stub server')
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--delay', type=float, default=0.0, help='stub response delay in seconds')
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server, url = serve(delay=args.delay)
+    secret = 'c2VjcmV0'
+    for label, session in (('requests.*', _Unpooled()), ('pooled', create_session())):
+        # Unthrottled, so the timings show connection overhead rather than the rate limit
+        scheduler = RequestScheduler(TokenBucket(1e9, 1e9), TokenBucket(1e9, 1e9))
+        client = AuthenticatedClient('key', secret, 'passphrase', url=url, session=session, scheduler=scheduler)
+        for name, latencies in measure(client, args.count).items():
+            print('{:10} {:20} mean {:7.3f} ms  p50 {:7.3f} ms  p99 {:7.3f} ms'.format(
+                label, name, latencies.mean(), np.percentile(latencies, 50), np.percentile(latencies, 99)))
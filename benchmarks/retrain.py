@@ -0,0 +1,46 @@
+#
+# benchmarks/retrain.py
+#
+# Checks a Retrainer pass on synthetic candles: the candles added are exactly
+# those after the last trained one up to the end of the last completed block,
+# including the later candles of the block that straddles the initial
+# training boundary, and times the retrain.
+#
+#   python -m benchmarks.retrain [--train N] [--live N]
+
+import argparse
+
+import numpy as np
+
+from Services.Trend import Forecast, Retrainer
+from benchmarks.support_resistance import candles
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--train', type=int, default=8000, help='candles the models are first trained on')
+    parser.add_argument('--live', type=int, default=4000, help='candles processed after training')
+    args = parser.parse_args()
+
+    data = candles(args.train + args.live)
+    forecast = Forecast(data.iloc[:args.train])
+    trained_until = forecast.trained_until
+    trained = len(forecast.direction.raw)
+    forecast.process(data)
+    ohlc = forecast.ohlc
+
+    # The last training candle sits inside a block that goes on in the live candles
+    ends = ohlc.groupby('block')['time'].agg(['min', 'max'])
+    straddling = ends[(ends['min'] <= trained_until) & (ends['max'] > trained_until)]
+    assert len(straddling) == 1, 'no block straddles the training boundary, try another --train'
+
+    retrainer = Retrainer(forecast, window=None)
+    assert retrainer.retrain()
+    expected = ohlc[(ohlc['time'] > trained_until) & (ohlc['time'] <= forecast.trained_until)]
+    direction = forecast.direction
+    assert retrainer.metrics['candles'] == len(expected) == len(direction.raw) - trained
+    np.testing.assert_array_equal(direction.raw[trained:], expected[direction.features].values)
+    assert expected['block'].iloc[0] == straddling.index[0], 'straddling block skipped'
+    assert forecast.trained_until == ends['max'].iloc[-3], 'last completed block not added'
+    print('{} candles in {} blocks added, from the straddling block on, in {:.3f} s'.format(
+        retrainer.metrics['candles'], retrainer.metrics['blocks'], retrainer.metrics['seconds']))
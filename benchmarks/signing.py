@@ -0,0 +1,53 @@
+#
+# benchmarks/signing.py
+#
+# Cost of signing one REST request: decoding the secret and keying a new HMAC
+# per call (as get_auth_headers used to) versus copying a cached Signer
+#
+#   python -m benchmarks.signing [--count N] [--orders-per-minute N]
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from Connections.gdax.gdax_auth import Signer
+
+
+def sign_uncached(secret, message):
+    signature = hmac.new(base64.b64decode(secret), message.encode('ascii'), hashlib.sha256)
+    return base64.b64encode(signature.digest()).decode('utf-8')
+
+
+def measure(sign, messages, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for message in messages:
+            sign(message)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(messages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--orders-per-minute', type=int, default=600)
+    args = parser.parse_args()
+
+    secret = base64.b64encode(os.urandom(64)).decode()
+    body = json.dumps({'product_id': 'BTC-USD', 'side': 'buy', 'type': 'limit', 'price': '6500.01',
+                       'size': '0.01', 'post_only': True})
+    messages = ['{:.6f}POST/orders{}'.format(time.time() + i, body) for i in range(args.count)]
+
+    signer = Signer(secret)
+    assert signer.sign(messages[0]) == sign_uncached(secret, messages[0])
+    for name, sign in (('uncached', lambda message: sign_uncached(secret, message)), ('Signer', signer.sign)):
+        per_call = measure(sign, messages, args.repeat)
+        print('{:10} {:7.2f} us/signature  {:8.3f} ms/minute at {} orders/minute'.format(
+            name, per_call * 1e6, per_call * 1e3 * args.orders_per_minute, args.orders_per_minute))
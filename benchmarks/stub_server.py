@@ -0,0 +1,126 @@
+#
+# benchmarks/stub_server.py
+#
+# Minimal local stand-in for the GDAX REST API used by the benchmarks
+#
+#   python -m benchmarks.stub_server [--port 8799]
+
+import argparse
+import calendar
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so connections are kept alive between requests
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # stall every keep-alive response by ~40ms
+    disable_nagle_algorithm = True
+    delay = 0.0
+    # List that receives (time, method, path) of every request, when set
+    log = None
+
+    def _send(self, body, status=200):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _record(self):
+        if self.log is not None:
+            self.log.append((time.time(), self.command, self.path))
+
+    def do_GET(self):
+        self._record()
+        if self.delay:
+            time.sleep(self.delay)
+        url = urlparse(self.path)
+        if url.path.endswith('/candles'):
+            self._send(candles(parse_qs(url.query)))
+        elif url.path.endswith('/book'):
+            self._send({'sequence': 1, 'bids': [['100.00', '1.0', 1]], 'asks': [['100.01', '1.0', 1]]})
+        elif url.path.rstrip('/').endswith('/accounts'):
+            # Tagged with the caller's API key, so responses of different accounts can be told apart
+            self._send([{'id': 'account', 'currency': 'USD', 'profile_id': self.headers.get('CB-ACCESS-KEY')}])
+        elif url.path.endswith('/time'):
+            self._send({'iso': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'epoch': time.time()})
+        else:
+            self._send([])
+
+    def do_POST(self):
+        self._record()
+        if self.delay:
+            time.sleep(self.delay)
+        body = self._read_body()
+        body.setdefault('id', '{:032x}'.format(int(time.time() * 1e6)))
+        body.setdefault('status', 'pending')
+        self._send(body)
+
+    def do_DELETE(self):
+        self._record()
+        if self.delay:
+            time.sleep(self.delay)
+        self._send([self.path.rsplit('/', 1)[-1]])
+
+    def log_message(self, *args):
+        pass
+
+
+def candles(query):
+    """Candles from `start` to `end` (inclusive, at most 300, none in the future), newest first.
+
+    Without `start`/`end` the last 300 candles. The close is derived from the time,
+    so the same candle is identical in every response.
+    """
+    granularity = int(query.get('granularity', ['60'])[0])
+    now = int(time.time()) // granularity * granularity
+    end = min(_epoch(query['end'][0]) // granularity * granularity, now) if 'end' in query else now
+    start = -(-_epoch(query['start'][0]) // granularity) * granularity if 'start' in query else end - 299 * granularity
+    start = max(start, end - 299 * granularity)
+    return [[t, 99.0, 101.0, 100.0, 100.0 + t // granularity % 100 / 100.0, 1.0] for t in range(end, start - 1, -granularity)]
+
+
+def _epoch(iso):
+    return calendar.timegm(time.strptime(iso, '%Y-%m-%dT%H:%M:%SZ'))
+
+
+def serve(port=0, delay=0.0, log=None):
+    """Start the stub on a daemon thread.
+
+    Args:
+        log (Optional[list]): Receives (time, method, path) of every request.
+
+    Returns:
+        tuple: (server, base url)
+
+    """
+    handler = type('Handler', (StubHandler,), {'delay': delay, 'log': log})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before every response')
+    args = parser.parse_args()
+
+    server, url = serve(args.port, args.delay)
+    print('Serving on {}'.format(url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,83 @@
+#
+# benchmarks/support_resistance.py
+#
+# Vectorized support/resistance detection against the previous iterrows/.loc
+# implementation, on synthetic candles. Also checks both give identical results.
+#
+#   python -m benchmarks.support_resistance [--count N] [--legacy-count N]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from Services import SupportResistance
+
+
+def legacy_find_groups(ohlc, smooth, delimiter):
+    ohlc['smooth']      = ohlc['close'].rolling(smooth).mean()
+    ohlc['delimiter']   = ohlc['close'].rolling(delimiter).mean()
+    groups              = ohlc[ (ohlc['smooth']>=ohlc['delimiter']) & (ohlc['smooth'].shift(1)<ohlc['delimiter'].shift(1)) ].reset_index()[['index']]
+    groups['next'] = groups['index'].shift(-1)
+    for i,r in groups.iterrows():
+        section  = ohlc.loc[ r['index']:r['next'] ]
+        groups.loc[i, 'high']    = section['close'].max()
+        groups.loc[i, 'low']     = section['close'].min()
+        groups.loc[i, 'h index'] = section[ section['close'] == section['close'].max() ].index.min()
+        groups.loc[i, 'l index'] = section[ section['close'] == section['close'].min() ].index.min()
+    return groups
+
+
+def legacy_find_tops_and_bottoms(OHLC, smooth, delimiter):
+    ohlc = OHLC.copy()
+    ohlc.sort_index(inplace=True)
+    groups  = legacy_find_groups(ohlc, smooth=smooth, delimiter=delimiter)
+    support = pd.DataFrame(
+                  groups[['h index','high']].values.tolist() +
+                  groups[['l index','low' ]].values.tolist(),
+                  columns=['index','support']
+              ).set_index('index').sort_index()
+    support['% change'] = support['support'] / support['support'].shift(1) - 1
+
+    for i,r in support.iterrows():
+        ohlc.loc[i:, 'last support'] = r['support']
+
+    for i,r in support[::-1].iterrows():
+        ohlc.loc[:i, 'next support'] = r['support']
+
+    ohlc['% from last support'] = ohlc['close'].rolling(3).mean() / ohlc['last support'] - 1
+    return ohlc
+
+
+def candles(count, seed=0):
+    """Random walk closes rounded to cents, so sections have tied highs and lows."""
+    rnd = np.random.default_rng(seed)
+    close = np.round(6500 + np.cumsum(rnd.normal(0, 2, count)), 2)
+    return pd.DataFrame({'time': 1500000000 + 60 * np.arange(count), 'low': close - 1, 'high': close + 1,
+                         'open': np.roll(close, 1), 'close': close, 'volume': rnd.random(count)})
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--legacy-count', type=int, default=20000, help='candles for the (slow) old implementation')
+    parser.add_argument('--smooth', type=int, default=25)
+    parser.add_argument('--delimiter', type=int, default=50)
+    args = parser.parse_args()
+
+    ohlc = candles(args.legacy_count)
+    expected, legacy = timed(legacy_find_tops_and_bottoms, ohlc, args.smooth, args.delimiter)
+    (result, _, _), vectorized = timed(SupportResistance.find_tops_and_bottoms, ohlc, args.smooth, args.delimiter)
+    pd.testing.assert_frame_equal(result, expected)
+    print('{:>8} candles  legacy {:8.3f} s  vectorized {:8.4f} s  (identical)'.format(len(ohlc), legacy, vectorized))
+
+    ohlc = candles(args.count)
+    _, vectorized = timed(SupportResistance.find_tops_and_bottoms, ohlc, args.smooth, args.delimiter)
+    print('{:>8} candles  vectorized {:8.4f} s'.format(len(ohlc), vectorized))